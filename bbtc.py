@@ -17,18 +17,25 @@
 
 import asyncio
 import argparse
-from os import path
 import logging
-
-from ble.ble_connection_constants import BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, \
-    BBTC_RX_CHAR_UUID, SERVER_COMMON_NAME
-from ble.ble_stream import BleStream
-from ble.ble_stream_secure import BleStreamSecure
-from ble import ble_scanner
+import sys
+from functools import partial
+from typing import Optional, Tuple
+
+from ble import ble_scanner, link_bench
+from ble.ble_session import open_secure_session
+from ble.ble_stream_secure import BleStreamSecure, TLS_PROFILES
+from ble.device_cache import DeviceCache, DEFAULT_CACHE_PATH
+from ble.connection_manager import ConnectionManager
+from ble.ble_trace import TraceWriter, ReplaySecureStream
 from cli.cli import CLI
 from dataset.dataset import ThreadDataset
+from dataset import dataset_bank, dataset_tool, network_planner
+from fleet import fleet_tool
 from cli.command import CommandResult
-from utils import select_device_by_user_input
+from utils import select_device_by_user_input, profiling
+from utils.loop_monitor import LoopLagMonitor
+from utils.ndjson import OUTPUT_FORMATS, stdout_records
 
 
 async def main():
@@ -36,38 +43,100 @@ async def main():
 
     parser = argparse.ArgumentParser(description='Device parameters')
     parser.add_argument('--debug', help='Enable debug logs', action='store_true')
+    parser.add_argument('--profile', type=str, metavar='FILE', action='store',
+                        help='Profile the session and write the report to FILE')
+    parser.add_argument('--slow-callback', type=float, metavar='SECONDS',
+                        help='Report code blocking the event loop for longer than '
+                        'SECONDS, with the stack of its coroutine. Runs the loop '
+                        'in asyncio debug mode.')
+    parser.add_argument('--adapter', type=str, help='Bluetooth adapter to use, e.g. hci0',
+                        action='store')
+    parser.add_argument('--tls-profile', choices=TLS_PROFILES, default='default',
+                        help='TLS settings, "lean" restricts the handshake to '
+                        'TLS 1.3 with P-256 to save link round trips')
+    parser.add_argument('--output', choices=OUTPUT_FORMATS, default='text',
+                        help='Format of command results, "ndjson" writes one JSON '
+                        'record per command to stdout and all other messages '
+                        'to stderr')
+    parser.add_argument('--device-cache', type=str, metavar='FILE',
+                        default=DEFAULT_CACHE_PATH,
+                        help='File remembering the addresses of devices connected '
+                        'to by name, to connect directly next time, and the '
+                        'calibrated link parameters of every device. '
+                        'An empty string disables it.')
     group = parser.add_mutually_exclusive_group()
     group.add_argument('--mac', type=str, help='Device MAC address', action='store')
     group.add_argument('--name', type=str, help='Device name', action='store')
     group.add_argument('--scan', help='Scan all available devices', action='store_true')
+    group.add_argument('--replay', type=str, metavar='TRACE', action='store',
+                       help='Replay the application data of a recorded session')
+    parser.add_argument('--trace', type=str, metavar='FILE', action='store',
+                        help='Record the session to a binary trace file')
+    parser.add_argument('--replay-speed', type=float, default=1.0, action='store',
+                        help='Replay speed factor, 0 replays without delays')
     args = parser.parse_args()
 
     if args.debug:
         logging.getLogger('ble_stream').setLevel(logging.DEBUG)
         logging.getLogger('ble_stream_secure').setLevel(logging.DEBUG)
 
-    device = await get_device_by_args(args)
+    if args.profile:
+        profiling.enable(args.profile)
+    try:
+        await run_session(args)
+    finally:
+        profiling.write_report()
+
 
+async def run_session(args):
+    trace = TraceWriter(args.trace) if args.trace else None
+    if trace is not None:
+        print(f'WARNING: {args.trace} holds the plaintext data of the session. '
+              'Network keys and PSKc are masked, other dataset fields and credentials '
+              'are not.', file=sys.stderr)
+    try:
+        await run_cli(args, trace)
+    finally:
+        if trace is not None:
+            trace.close()
+
+
+async def run_cli(args, trace):
+    device_cache = DeviceCache(args.device_cache) if args.device_cache else None
+    connection_manager = ConnectionManager(
+        adapter=args.adapter,
+        connect=partial(open_secure_session, trace=trace, tls_profile=args.tls_profile,
+                        device_cache=device_cache))
+    lag_monitor = None
+    if args.slow_callback is not None or args.profile:
+        lag_monitor = LoopLagMonitor(
+            slow_callback_duration=args.slow_callback,
+            on_slow_callback=lambda slow: print(slow, file=sys.stderr))
+        lag_monitor.start()
+    try:
+        with stdout_records(args.output) as records:
+            await run_cli_loop(args, connection_manager, device_cache, records)
+    finally:
+        await connection_manager.close_all()
+        if lag_monitor is not None:
+            await lag_monitor.stop()
+            profiling.add_metrics('event loop lag', lag_monitor.metrics())
+            if args.slow_callback is not None:
+                print(lag_monitor, file=sys.stderr)
+
+
+async def run_cli_loop(args, connection_manager, device_cache, records):
     ble_sstream = None
+    address = None
 
-    if not (device is None):
-        print(f'Connecting to {device}')
-        ble_stream = await BleStream.create(
-            device.address, BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, BBTC_RX_CHAR_UUID
-        )
-        ble_sstream = BleStreamSecure(ble_stream)
-        ble_sstream.load_cert(
-            certfile=path.join('auth', 'commissioner_cert.pem'),
-            keyfile=path.join('auth', 'commissioner_key.pem'),
-            cafile=path.join('auth', 'ca_cert.pem'),
-        )
-
-        print('Setting up secure channel...')
-        await ble_sstream.do_handshake(hostname=SERVER_COMMON_NAME)
-        print('Done')
+    if args.replay:
+        ble_sstream = ReplaySecureStream.load(args.replay, speed=args.replay_speed)
+    else:
+        ble_sstream, address = await connect_by_args(args, connection_manager,
+                                                     device_cache)
 
     ds = ThreadDataset()
-    cli = CLI(ds, ble_sstream)
+    cli = CLI(ds, ble_sstream, connection_manager, address)
     loop = asyncio.get_running_loop()
     print('Enter \'help\' to see available commands'
           ' or \'exit\' to exit the application.')
@@ -78,25 +147,86 @@ async def main():
             break
         try:
             result: CommandResult = await cli.evaluate_input(user_input)
-            if result:
-                result.pretty_print()
+            if records is None:
+                if result:
+                    result.pretty_print()
+            else:
+                record = result.to_record() if result else None
+                if record is not None:
+                    records.write({'command': user_input, 'result': record})
         except Exception as e:
             print(e)
+            if records is not None:
+                records.write({'command': user_input, 'error': str(e)})
+        if records is not None:
+            records.flush()
+
+
+async def connect_by_args(args, connection_manager: ConnectionManager,
+                          device_cache: Optional[DeviceCache]
+                          ) -> Tuple[Optional[BleStreamSecure], Optional[str]]:
+    # a known address is connected to directly, scanning only if that fails
+    address = None
+    adapter = args.adapter
+    if args.mac:
+        address = args.mac.upper()
+    elif args.name and device_cache is not None:
+        address = device_cache.lookup(args.name)
+        if adapter is None:
+            # the device is reached through the adapter that reached it last time
+            adapter = device_cache.lookup_adapter(args.name)
+    if address is not None:
+        via = f' through {adapter}' if adapter != args.adapter else ''
+        print(f'Connecting to {address}{via} and setting up secure channel...')
+        try:
+            ble_sstream = await connection_manager.get(address, max_attempts=1,
+                                                       adapter=adapter)
+            if args.name:
+                device_cache.store(args.name, address, adapter)
+            print('Done')
+            return ble_sstream, address
+        except Exception as e:
+            print(f'Direct connection failed ({e}), scanning...')
+            if args.name:
+                device_cache.forget(args.name)
+
+    device = await get_device_by_args(args)
+    if device is None:
+        return None, None
+    print(f'Connecting to {device} and setting up secure channel...')
+    ble_sstream = await connection_manager.get(device.address)
+    if device.name and device_cache is not None:
+        device_cache.store(device.name, device.address, args.adapter)
+    print('Done')
+    return ble_sstream, device.address
 
 
 async def get_device_by_args(args):
     device = None
     if args.mac:
-        device = await ble_scanner.find_first_by_mac(args.mac)
+        device = await ble_scanner.find_first_by_mac(args.mac, adapter=args.adapter)
     elif args.name:
-        device = await ble_scanner.find_first_by_name(args.name)
+        device = await ble_scanner.find_first_by_name(args.name, adapter=args.adapter)
     elif args.scan:
-        tcat_devices = await ble_scanner.scan_tcat_devices()
-        device = select_device_by_user_input(tcat_devices)
+        tcat_devices = await ble_scanner.scan_tcat_devices(adapter=args.adapter)
+        device = await asyncio.get_running_loop().run_in_executor(
+            None, select_device_by_user_input, tcat_devices)
 
     return device
 
+
+# tools run as 'bbtc.py <tool> [args]'
+TOOLS = {
+    'dataset-bank': dataset_bank.main,
+    'dataset-tool': dataset_tool.main,
+    'fleet': fleet_tool.main,
+    'link-bench': link_bench.main,
+    'network-planner': network_planner.main,
+}
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in TOOLS:
+        sys.exit(TOOLS[sys.argv[1]](sys.argv[2:]))
     try:
         asyncio.run(main())
     except asyncio.CancelledError:
@@ -14,28 +14,54 @@
    limitations under the License.
 """
 
+import time
+from typing import List
+
 from bleak import BleakScanner
-from bbtc import BBTC_SERVICE_UUID
+from ble.ble_connection_constants import BBTC_SERVICE_UUID
+from ble.ble_stream import adapter_kwargs
 
 
-async def find_first_by_name(name):
+async def find_first_by_name(name, adapter=None):
     match_name = lambda dev, adv_data: name == dev.name
-    device = await BleakScanner.find_device_by_filter(match_name)
+    device = await BleakScanner.find_device_by_filter(match_name,
+                                                      **adapter_kwargs(adapter))
     return device
 
 
-async def find_first_by_mac(mac):
+async def find_first_by_mac(mac, adapter=None):
     match_mac = lambda dev, adv_data: mac.upper() == dev.address
-    device = await BleakScanner.find_device_by_filter(match_mac)
+    device = await BleakScanner.find_device_by_filter(match_mac,
+                                                      **adapter_kwargs(adapter))
     return device
 
 
-async def scan_tcat_devices():
-    scanner = BleakScanner()
-    tcat_devices = []
-    devices_dict = await scanner.discover(return_adv=True,
+class Advertisement:
+    def __init__(self, device, adv_data, adapter=None):
+        self.device = device
+        self.address = device.address
+        self.name = adv_data.local_name or device.name
+        self.rssi = adv_data.rssi
+        self.tx_power = adv_data.tx_power
+        self.manufacturer_data = adv_data.manufacturer_data
+        self.service_data = adv_data.service_data
+        self.adapter = adapter
+        self.seen = time.time()
+
+    def __str__(self):
+        return f'{self.name} - {self.address} ({self.rssi} dBm)'
+
+
+async def scan_tcat_advertisements(adapter=None, timeout=5.0) -> List[Advertisement]:
+    # strongest signal first
+    scanner = BleakScanner(**adapter_kwargs(adapter))
+    devices_dict = await scanner.discover(timeout=timeout, return_adv=True,
                                           service_uuids=[BBTC_SERVICE_UUID.lower()])
-    for _, (device, _) in devices_dict.items():
-        tcat_devices.append(device)
+    advertisements = [Advertisement(device, adv_data, adapter)
+                      for device, adv_data in devices_dict.values()]
+    advertisements.sort(key=lambda adv: adv.rssi, reverse=True)
+    return advertisements
+
 
-    return tcat_devices
+async def scan_tcat_devices(adapter=None):
+    return [adv.device for adv in await scan_tcat_advertisements(adapter)]
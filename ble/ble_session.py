@@ -0,0 +1,111 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import ssl
+from functools import lru_cache
+from os import path
+from typing import List
+
+from ble.ble_connection_constants import BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, \
+    BBTC_RX_CHAR_UUID, SERVER_COMMON_NAME
+from ble.ble_stream import BleStream, DEFAULT_RECEIVE_LIMIT
+from ble.ble_stream_secure import BleStreamSecure, create_ssl_context
+from ble.command_queue import Priority
+from ble.link_calibration import LinkCalibration
+from tlv.tlv import TLV, TLVStreamParser
+from utils import profiling
+from utils.retry import RetryPolicy
+
+# a failed handshake is not retried on the same link, the session is opened again
+HANDSHAKE_POLICY = RetryPolicy(timeout=20.0)
+
+
+@lru_cache(maxsize=None)
+def commissioner_ssl_context(tls_profile: str = 'default') -> ssl.SSLContext:
+    # loading the default CA store and the certificates takes tens of milliseconds,
+    # the context is shared by all sessions instead of blocking the loop for each
+    ssl_context = create_ssl_context(tls_profile)
+    ssl_context.load_cert_chain(
+        certfile=path.join('auth', 'commissioner_cert.pem'),
+        keyfile=path.join('auth', 'commissioner_key.pem'),
+    )
+    ssl_context.load_verify_locations(cafile=path.join('auth', 'ca_cert.pem'))
+    return ssl_context
+
+
+async def open_secure_session(address, adapter=None, trace=None, crypto_executor=None,
+                              tls_profile='default', receive_limit=DEFAULT_RECEIVE_LIMIT,
+                              link_profile=None, device_cache=None) -> BleStreamSecure:
+    with profiling.profile('connect'):
+        return await _open_secure_session(address, adapter, trace, crypto_executor,
+                                          tls_profile, receive_limit, link_profile,
+                                          device_cache)
+
+
+async def _open_secure_session(address, adapter=None, trace=None, crypto_executor=None,
+                               tls_profile='default', receive_limit=DEFAULT_RECEIVE_LIMIT,
+                               link_profile=None, device_cache=None) -> BleStreamSecure:
+    # a stored calibration of the link is reused, otherwise the handshake measures it
+    calibration = None
+    if device_cache is not None:
+        record = device_cache.lookup_link(address)
+        calibration = LinkCalibration.from_dict(record) if record else None
+    # link_profile shapes the link to reproduce bad radio conditions, see link_shaper
+    ble_stream = await BleStream.create(
+        address, BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, BBTC_RX_CHAR_UUID,
+        adapter=adapter, trace=trace, receive_limit=receive_limit,
+        link_profile=link_profile, calibration=calibration
+    )
+    try:
+        ble_sstream = BleStreamSecure(ble_stream, crypto_executor,
+                                      commissioner_ssl_context(tls_profile))
+        await HANDSHAKE_POLICY.run(
+            lambda: ble_sstream.do_handshake(hostname=SERVER_COMMON_NAME),
+            f'TLS handshake with {address}')
+    except BaseException:
+        await ble_stream.disconnect()
+        if calibration is not None:
+            # the link may have changed since, it is measured again next time
+            device_cache.forget_link(address)
+        elif device_cache is not None and ble_stream.calibration.failed:
+            # the next session uses the write mode which did not fail
+            device_cache.store_link(address, ble_stream.finish_calibration().to_dict())
+        raise
+    ble_stream.finish_calibration()
+    if device_cache is not None and calibration is None:
+        device_cache.store_link(address, ble_stream.calibration.to_dict())
+    return ble_sstream
+
+
+async def close_secure_session(ble_sstream: BleStreamSecure):
+    await ble_sstream.ble_stream.disconnect()
+
+
+async def send_tlv_requests(ble_sstream: BleStreamSecure, requests: List[TLV],
+                            timeout=5, priority=Priority.NORMAL) -> List[TLV]:
+    # all requests go out in a single write, responses are collected until there
+    # is one for every request or the device stops responding
+    async with ble_sstream.queue.slot(priority):
+        await ble_sstream.discard_unexpected()
+        await ble_sstream.send(b''.join(request.to_bytes() for request in requests))
+        parser = TLVStreamParser()
+        responses: List[TLV] = []
+        while len(responses) < len(requests):
+            data = await ble_sstream.recv(buffersize=4096, timeout=timeout)
+            if not data:
+                break
+            responses += parser.feed(data)
+    return responses
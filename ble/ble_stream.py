@@ -18,63 +18,196 @@ from itertools import count, takewhile
 from typing import Iterator
 import logging
 import time
-from asyncio import sleep
+from asyncio import ensure_future, sleep
 
 from bleak import BleakClient
 from bleak.backends.characteristic import BleakGATTCharacteristic
 
+from ble.ble_trace import TraceRecordType
+from ble.link_calibration import (LinkCalibration, MIN_NOTIFICATION_SIZE, WITH_RESPONSE,
+                                  WRITE_MODES, WRITE_WITHOUT_RESPONSE)
+from ble.link_shaper import ShapedClient
+from utils import profiling
+from utils.retry import RetryPolicy
+
 logger = logging.getLogger(__name__)
 
 
+# received data not read yet, per session. TCAT responses and TLS records are far
+# smaller, only a misbehaving peer gets close to it. The session is dropped when it
+# is exceeded: turning notifications off would not hold the data back, GATT servers
+# do not queue notifications while they are disabled, they are lost.
+DEFAULT_RECEIVE_LIMIT = 32 * 1024
+# connecting sometimes fails transiently, a second attempt usually succeeds
+CONNECT_POLICY = RetryPolicy(timeout=15.0, attempts=2)
+NOTIFY_POLICY = RetryPolicy(timeout=5.0, attempts=2)
+# GATT properties allowing each write mode
+WRITE_PROPERTIES = {WRITE_WITHOUT_RESPONSE: 'write-without-response',
+                    WITH_RESPONSE: 'write'}
+
+
+def adapter_kwargs(adapter=None):
+    return {'adapter': adapter} if adapter else {}
+
+
+class ReceiveBufferOverflow(ConnectionError):
+    pass
+
+
 class BleStream:
-    def __init__(self, client, service_uuid, tx_char_uuid, rx_char_uuid):
-        self.__receive_buffer = b''
+    def __init__(self, client, service_uuid, tx_char_uuid, rx_char_uuid, trace=None,
+                 receive_limit=DEFAULT_RECEIVE_LIMIT, calibration=None):
+        self.__receive_buffer = bytearray()
         self.__last_recv_time = None
+        self.__overflowed = False
         self.client = client
         self.service_uuid = service_uuid
         self.tx_char_uuid = tx_char_uuid
         self.rx_char_uuid = rx_char_uuid
+        self.receive_limit = receive_limit
+        self.counters = profiling.new_counters()
+        self.trace = trace
+        # without a stored calibration, the first exchange of the session measures the
+        # link sizes and picks the write mode from the characteristic
+        self.calibration = calibration or LinkCalibration()
+        self.__calibrating = calibration is None
+        self.__rx_char = None
+        # notification callbacks cannot wait, what they start is kept here until done
+        self.__tasks = set()
+
+    @property
+    def buffered(self) -> int:
+        return len(self.__receive_buffer)
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
+
+    async def disconnect(self):
         if self.client.is_connected:
             await self.client.disconnect()
 
     def __handle_rx(self, _: BleakGATTCharacteristic, data: bytearray):
-        logger.debug(f'received {len(data)} bytes')
+        logger.debug('received %d bytes', len(data))
+        if self.__overflowed:
+            return
+        if len(self.__receive_buffer) + len(data) > self.receive_limit:
+            logger.warning('Receive buffer limit of %d bytes exceeded, disconnecting',
+                           self.receive_limit)
+            self.__overflowed = True
+            self.__receive_buffer = bytearray()
+            self.__start_task(self.disconnect())
+            return
         self.__receive_buffer += data
         self.__last_recv_time = time.time()
+        if self.__calibrating:
+            self.calibration.record_notification(len(data))
+        if self.trace is not None:
+            self.trace.record(TraceRecordType.NOTIFICATION, data)
+        if self.counters is not None:
+            self.counters.notifications += 1
+            self.counters.bytes_received += len(data)
+            self.counters.peak_receive_buffer = max(self.counters.peak_receive_buffer,
+                                                    len(self.__receive_buffer))
+
+    def __start_task(self, coroutine):
+        task = ensure_future(coroutine)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
 
     @staticmethod
     def __sliced(data: bytes, n: int) -> Iterator[bytes]:
         return takewhile(len, (data[i : i + n] for i in count(0, n)))
 
     @classmethod
-    async def create(cls, address, service_uuid, tx_char_uuid, rx_char_uuid):
-        client = BleakClient(address)
-        await client.connect()
-        self = cls(client, service_uuid, tx_char_uuid, rx_char_uuid)
-        await client.start_notify(self.tx_char_uuid, self.__handle_rx)
+    async def create(cls, address, service_uuid, tx_char_uuid, rx_char_uuid,
+                     adapter=None, trace=None, connect_policy=CONNECT_POLICY,
+                     notify_policy=NOTIFY_POLICY, link_profile=None, **stream_kwargs):
+        # 'adapter' selects the Bluetooth controller, e.g. 'hci1' on Linux
+        client = BleakClient(address, **adapter_kwargs(adapter))
+        if link_profile is not None:
+            client = ShapedClient(client, link_profile, address)
+        try:
+            await connect_policy.run(client.connect, f'Connecting to {address}')
+            return await cls.from_client(client, service_uuid, tx_char_uuid,
+                                         rx_char_uuid, trace=trace,
+                                         notify_policy=notify_policy, **stream_kwargs)
+        except BaseException:
+            # also after a cancelled attempt, which may have connected meanwhile
+            await client.disconnect()
+            raise
+
+    @classmethod
+    async def from_client(cls, client, service_uuid, tx_char_uuid, rx_char_uuid,
+                          trace=None, notify_policy=NOTIFY_POLICY, **stream_kwargs):
+        self = cls(client, service_uuid, tx_char_uuid, rx_char_uuid, trace=trace,
+                   **stream_kwargs)
+        await notify_policy.run(
+            lambda: client.start_notify(self.tx_char_uuid, self.__handle_rx),
+            'Enabling notifications')
         return self
 
+    def finish_calibration(self) -> LinkCalibration:
+        if self.__calibrating:
+            self.__calibrating = False
+            self.calibration.finish()
+            logger.info('Link calibrated: %s', self.calibration)
+            if self.calibration.notification_size <= MIN_NOTIFICATION_SIZE:
+                logger.info('Notifications of %d bytes, the ATT MTU was not raised',
+                            self.calibration.notification_size)
+        return self.calibration
+
+    def __write_modes(self, rx_char):
+        properties = getattr(rx_char, 'properties', None)
+        if properties is None:
+            return WRITE_MODES
+        return [mode for mode in WRITE_MODES
+                if WRITE_PROPERTIES[mode] in properties] or WRITE_MODES
+
     async def send(self, data):
-        logger.debug(f'sending {data}')
-        services = self.client.services.get_service(self.service_uuid)
-        rx_char = services.get_characteristic(self.rx_char_uuid)
-        for s in BleStream.__sliced(data, rx_char.max_write_without_response_size):
-            await self.client.write_gatt_char(rx_char, s)
+        logger.debug('sending %s', data)
+        rx_char = self.__rx_char
+        if rx_char is None:
+            services = self.client.services.get_service(self.service_uuid)
+            rx_char = self.__rx_char = services.get_characteristic(self.rx_char_uuid)
+        write_size = rx_char.max_write_without_response_size
+        if self.__calibrating:
+            self.calibration.choose_write_mode(self.__write_modes(rx_char))
+            self.calibration.record_write(min(len(data), write_size))
+        mode = self.calibration.write_mode
+        for s in BleStream.__sliced(data, write_size):
+            try:
+                await self.client.write_gatt_char(rx_char, s,
+                                                  response=mode == WITH_RESPONSE)
+            except Exception:
+                # part of the data may have arrived, it is not sent again in the
+                # other mode, the session fails and a new one uses the other mode
+                if self.__calibrating:
+                    self.calibration.record_failure(mode)
+                raise
+            if self.trace is not None:
+                self.trace.record(TraceRecordType.GATT_WRITE, s)
+            if self.counters is not None:
+                self.counters.gatt_writes += 1
+        if self.counters is not None:
+            self.counters.bytes_sent += len(data)
         return len(data)
 
     async def recv(self, bufsize, recv_timeout=0.2):
+        if self.__overflowed:
+            raise ReceiveBufferOverflow(
+                f'Receive buffer limit of {self.receive_limit} bytes exceeded')
         if not self.__receive_buffer:
             return b''
 
         while time.time() - self.__last_recv_time <= recv_timeout:
             await sleep(0.1)
+            if self.counters is not None:
+                self.counters.sleep_iterations += 1
 
-        message = self.__receive_buffer[:bufsize]
-        self.__receive_buffer = self.__receive_buffer[bufsize:]
-        logger.debug(f'retrieved {message}')
+        message = bytes(self.__receive_buffer[:bufsize])
+        del self.__receive_buffer[:bufsize]
+        logger.debug('retrieved %s', message)
         return message
@@ -17,19 +17,91 @@
 import asyncio
 import ssl
 import logging
+import time
+from concurrent.futures import Executor
+from typing import Dict, Optional
 
 from .ble_stream import BleStream
+from .command_queue import CommandQueue, Priority
+from .ble_trace import TraceRecordType
 
 logger = logging.getLogger(__name__)
 
+TLS_PROFILES = ['default', 'lean']
+# estimate of the OpenSSL state of a client session after the handshake, measured
+# once with OpenSSL 3.0 (21 KiB, 24 KiB with the lean profile), not per session
+TLS_SESSION_MEMORY_ESTIMATE = 24 * 1024
+
+
+def create_ssl_context(tls_profile: str = 'default') -> ssl.SSLContext:
+    ssl_context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+    if tls_profile == 'lean':
+        # fewer and shorter handshake messages, every one of them costs link time
+        ssl_context.minimum_version = ssl.TLSVersion.TLSv1_3
+        # offer only a P-256 key share, so that the device does not have to ask
+        # for another one with a HelloRetryRequest
+        ssl_context.set_ecdh_curve('prime256v1')
+        # no dummy ChangeCipherSpec records and legacy session ID
+        ssl_context.options &= ~getattr(ssl, 'OP_ENABLE_MIDDLEBOX_COMPAT', 0)
+    elif tls_profile != 'default':
+        raise ValueError(f'Unknown TLS profile: {tls_profile}')
+    return ssl_context
+
+
+class HandshakeStats:
+    def __init__(self):
+        self.flights_sent = 0
+        self.flights_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.duration = 0.0
+        self._sending = None
+
+    def __str__(self):
+        return f'{self.flights_sent} flight(s) / {self.bytes_sent} B sent, ' \
+            f'{self.flights_received} flight(s) / {self.bytes_received} B received, ' \
+            f'{self.duration:.2f} s'
+
+    def add_sent(self, length: int):
+        # a flight ends when the direction of the data changes
+        if length and self._sending is not True:
+            self.flights_sent += 1
+            self._sending = True
+        self.bytes_sent += length
+
+    def add_received(self, length: int):
+        if length and self._sending is not False:
+            self.flights_received += 1
+            self._sending = False
+        self.bytes_received += length
+
 
 class BleStreamSecure:
-    def __init__(self, ble_stream: BleStream):
+    def __init__(self, ble_stream: BleStream, crypto_executor: Optional[Executor] = None,
+                 ssl_context: Optional[ssl.SSLContext] = None):
         self.ble_stream = ble_stream
-        self.ssl_context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+        self.crypto_executor = crypto_executor
+        self.ssl_context = ssl_context or create_ssl_context()
+        self.handshake_stats: Optional[HandshakeStats] = None
         self.incoming = ssl.MemoryBIO()
         self.outgoing = ssl.MemoryBIO()
         self.ssl_object = None
+        # set once the device sent close_notify, nothing can be read or sent after it
+        self.peer_closed = False
+        self.counters = ble_stream.counters
+        self.trace = ble_stream.trace
+        # a slot is held for a whole request and its response, so that they stay paired
+        self.queue = CommandQueue()
+
+    def memory_usage(self) -> Dict[str, int]:
+        # bytes held by the session, the TLS state is not measured but estimated
+        return {
+            'receive_buffer': self.ble_stream.buffered,
+            'incoming_bio': self.incoming.pending,
+            'outgoing_bio': self.outgoing.pending,
+            'tls_state_estimate':
+                TLS_SESSION_MEMORY_ESTIMATE if self.ssl_object is not None else 0,
+        }
 
     def load_cert(self, certfile='', keyfile='', cafile=''):
         if certfile and keyfile:
@@ -47,62 +119,148 @@ class BleStreamSecure:
             server_side=False,
             server_hostname=hostname,
         )
+        stats = HandshakeStats()
+        start_time = time.monotonic()
         while True:
             try:
-                self.ssl_object.do_handshake()
+                await self._handshake_step()
                 break
             # SSLWantWrite means ssl wants to send data over the link,
             # but might need a receive first
             except ssl.SSLWantWriteError:
+                self._check_link()
                 output = await self.ble_stream.recv(4096)
                 if output:
-                    self.incoming.write(output)
+                    stats.add_received(len(output))
+                    self._feed_incoming(output)
                 data = self.outgoing.read()
                 if data:
-                    await self.ble_stream.send(data)
-                await asyncio.sleep(0.1)
+                    stats.add_sent(len(data))
+                    await self._send_records(data)
+                await self._sleep()
 
             # SSLWantRead means ssl wants to receive data from the link,
             # but might need to send first
             except ssl.SSLWantReadError:
+                self._check_link()
+                if self.counters is not None:
+                    self.counters.ssl_want_read_retries += 1
                 data = self.outgoing.read()
                 if data:
-                    await self.ble_stream.send(data)
+                    stats.add_sent(len(data))
+                    await self._send_records(data)
                 output = await self.ble_stream.recv(4096)
                 if output:
-                    self.incoming.write(output)
-                await asyncio.sleep(0.1)
+                    stats.add_received(len(output))
+                    self._feed_incoming(output)
+                await self._sleep()
+
+        # the last flight goes out together with the first request
+        stats.add_sent(self.outgoing.pending)
+        stats.duration = time.monotonic() - start_time
+        self.handshake_stats = stats
+        if self.counters is not None:
+            self.counters.count_handshake(stats)
+        logger.info('TLS handshake done, %s', stats)
+
+    async def _handshake_step(self):
+        # handshake steps do the ECDHE and ECDSA operations, the ssl module releases
+        # the GIL meanwhile, so on a thread they do not stall other sessions
+        if self.crypto_executor is None:
+            self.ssl_object.do_handshake()
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                self.crypto_executor, self.ssl_object.do_handshake)
 
     async def send(self, bytes):
+        self._check_link()
+        if self.trace is not None:
+            self.trace.record(TraceRecordType.APP_WRITE, bytes)
         self.ssl_object.write(bytes)
-        encode = self.outgoing.read(4096)
-        await self.ble_stream.send(encode)
+        encode = self.outgoing.read()
+        await self._send_records(encode)
 
     async def recv(self, buffersize, timeout=1):
-        end_time = asyncio.get_event_loop().time() + timeout
+        loop = asyncio.get_event_loop()
+        end_time = loop.time() + timeout
         data = await self.ble_stream.recv(buffersize)
-        while not data and asyncio.get_event_loop().time() < end_time:
-            await asyncio.sleep(0.1)
+        while not data and loop.time() < end_time:
+            await self._sleep()
             data = await self.ble_stream.recv(buffersize)
         if not data:
             logger.warning('No response when response expected.')
             return b''
 
-        self.incoming.write(data)
+        self._feed_incoming(data)
         while True:
             try:
-                decode = self.ssl_object.read(4096)
+                decode = self._read()
                 break
             # if recv called before entire message was received from the link
             except ssl.SSLWantReadError:
+                if self.counters is not None:
+                    self.counters.ssl_want_read_retries += 1
                 more = await self.ble_stream.recv(buffersize)
                 while not more:
-                    await asyncio.sleep(0.1)
+                    # the rest of the record may never come
+                    self._check_link()
+                    if loop.time() >= end_time:
+                        raise TimeoutError('Incomplete TLS record received')
+                    await self._sleep()
                     more = await self.ble_stream.recv(buffersize)
-                self.incoming.write(more)
+                self._feed_incoming(more)
+
+        # several records may have arrived at once, return all of them
+        while not self.peer_closed:
+            try:
+                decode += self._read()
+            except ssl.SSLWantReadError:
+                break
+        if self.trace is not None:
+            self.trace.record(TraceRecordType.APP_READ, decode)
         return decode
 
-    async def send_with_resp(self, bytes):
-        await self.send(bytes)
-        res = await self.recv(buffersize=4096, timeout=5)
+    def _read(self) -> bytes:
+        try:
+            data = self.ssl_object.read(4096)
+        except ssl.SSLZeroReturnError:
+            data = b''
+        # after close_notify, every read returns nothing instead of waiting for data
+        if not data:
+            self.peer_closed = True
+        return data
+
+    def _check_link(self):
+        if self.peer_closed:
+            raise ConnectionError('Session closed by the device')
+        if not self.ble_stream.client.is_connected:
+            raise ConnectionError('Link to the device lost')
+
+    async def _send_records(self, data):
+        if self.counters is not None:
+            self.counters.count_records_sent(data)
+        await self.ble_stream.send(data)
+
+    def _feed_incoming(self, data):
+        if self.counters is not None:
+            self.counters.count_records_received(data)
+        self.incoming.write(data)
+
+    async def _sleep(self, delay=0.1):
+        if self.counters is not None:
+            self.counters.sleep_iterations += 1
+        await asyncio.sleep(delay)
+
+    async def discard_unexpected(self):
+        # data received outside of a request, e.g. a response that came after its
+        # deadline, would be taken for the response to the next request
+        if self.ble_stream.buffered:
+            stale = await self.recv(buffersize=4096, timeout=1)
+            logger.warning('Discarded %d bytes received without a request', len(stale))
+
+    async def send_with_resp(self, bytes, timeout=5, priority=Priority.NORMAL):
+        async with self.queue.slot(priority):
+            await self.discard_unexpected()
+            await self.send(bytes)
+            res = await self.recv(buffersize=4096, timeout=timeout)
         return res
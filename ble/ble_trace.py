@@ -0,0 +1,177 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+import mmap
+import struct
+import time
+from enum import Enum
+from typing import Iterator, List, Tuple
+
+from ble.command_queue import CommandQueue, Priority
+from tlv.dataset_tlv import MeshcopTlvType
+from tlv.tcat_tlv import TcatTLVType
+from tlv.tlv import TLV
+from utils import profiling
+
+logger = logging.getLogger(__name__)
+
+TRACE_MAGIC = b'BBTCTRC1'
+# record type, seconds since the start of the trace, payload length
+RECORD_HEADER = struct.Struct('<BdI')
+
+
+class TraceRecordType(Enum):
+    NOTIFICATION = 0
+    GATT_WRITE = 1
+    # plaintext application data, as seen above the TLS layer
+    APP_WRITE = 2
+    APP_READ = 3
+
+
+TraceRecord = Tuple[TraceRecordType, float, bytes]
+
+DATASET_TLV_TYPES = {TcatTLVType.ACTIVE_DATASET.value}
+SECRET_DATASET_TYPES = {MeshcopTlvType.NETWORKKEY.value, MeshcopTlvType.PSKC.value}
+
+
+def mask_secrets(data: bytes) -> bytes:
+    # zeroes the network key and PSKc of datasets sent to the device, keeping all lengths
+    res = bytearray(data)
+    for type, start, end in _tlv_values(data):
+        if type in DATASET_TLV_TYPES:
+            res[start:end] = _mask_dataset(data[start:end])
+    return bytes(res)
+
+
+def _mask_dataset(value: bytes) -> bytes:
+    res = bytearray(value)
+    entries = list(_tlv_values(value))
+    if not entries or entries[-1][2] != len(value):
+        # not a well formed dataset, nothing of it is kept
+        return bytes(len(value))
+    for type, start, end in entries:
+        if type in SECRET_DATASET_TYPES:
+            res[start:end] = bytes(end - start)
+    return bytes(res)
+
+
+def _tlv_values(data: bytes) -> Iterator[Tuple[int, int, int]]:
+    # type, start and end of the value of every complete TLV in data
+    offset = 0
+    header = TLV.parse_header(data, offset)
+    while header is not None and offset + header[0] + header[1] <= len(data):
+        start = offset + header[0]
+        offset = start + header[1]
+        yield data[start - header[0]], start, offset
+        header = TLV.parse_header(data, offset)
+
+
+class TraceWriter:
+    def __init__(self, path: str, buffer_size: int = 64 * 1024):
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._file.write(TRACE_MAGIC)
+        self._start_time = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, type: TraceRecordType, data: bytes):
+        if type == TraceRecordType.APP_WRITE:
+            data = mask_secrets(data)
+        timestamp = time.monotonic() - self._start_time
+        self._file.write(RECORD_HEADER.pack(type.value, timestamp, len(data)))
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+def read_trace(path: str, use_mmap: bool = False) -> Iterator[TraceRecord]:
+    with open(path, 'rb') as file:
+        if use_mmap:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield from parse_trace(buffer)
+        else:
+            yield from parse_trace(file.read())
+
+
+def parse_trace(buffer) -> Iterator[TraceRecord]:
+    if buffer[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+        raise ValueError('Not a trace file')
+    offset = len(TRACE_MAGIC)
+    while offset + RECORD_HEADER.size <= len(buffer):
+        type, timestamp, length = RECORD_HEADER.unpack_from(buffer, offset)
+        offset += RECORD_HEADER.size
+        if offset + length > len(buffer):
+            logger.warning('Trace ends with a truncated record')
+            return
+        yield TraceRecordType(type), timestamp, bytes(buffer[offset:offset + length])
+        offset += length
+
+
+# Plays back the plaintext application data of a trace in place of BleStreamSecure.
+# TLS keys are different in every session, so the recorded ciphertext cannot be
+# decrypted again, this replays the session above the TLS layer instead.
+class ReplaySecureStream:
+    def __init__(self, records: List[TraceRecord], speed: float = 1.0):
+        self.records = [record for record in records if record[0] in
+                        (TraceRecordType.APP_WRITE, TraceRecordType.APP_READ)]
+        self.speed = speed
+        self.counters = profiling.new_counters()
+        self.queue = CommandQueue()
+        self._position = 0
+        self._previous_time = 0.0
+
+    @classmethod
+    def load(cls, path: str, speed: float = 1.0, use_mmap: bool = False):
+        return cls(list(read_trace(path, use_mmap=use_mmap)), speed)
+
+    async def _advance(self):
+        type, timestamp, data = self.records[self._position]
+        self._position += 1
+        if self.speed > 0 and timestamp > self._previous_time:
+            await asyncio.sleep((timestamp - self._previous_time) / self.speed)
+        self._previous_time = timestamp
+        return type, data
+
+    async def send(self, bytes):
+        # skip responses that were not read, up to the next recorded write
+        while self._position < len(self.records):
+            type, _ = await self._advance()
+            if type == TraceRecordType.APP_WRITE:
+                return
+
+    async def recv(self, buffersize, timeout=1):
+        if self._position >= len(self.records) or \
+                self.records[self._position][0] != TraceRecordType.APP_READ:
+            logger.warning('No response when response expected.')
+            return b''
+        _, data = await self._advance()
+        return data
+
+    async def discard_unexpected(self):
+        # responses are replayed in order, there is nothing unexpected
+        pass
+
+    async def send_with_resp(self, bytes, timeout=5, priority=Priority.NORMAL):
+        async with self.queue.slot(priority):
+            await self.send(bytes)
+            return await self.recv(buffersize=4096, timeout=timeout)
@@ -0,0 +1,179 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from ble.ble_session import open_secure_session, close_secure_session
+from ble.ble_stream_secure import BleStreamSecure
+from ble.command_queue import Priority
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+from utils.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# empty application data, answered by the device without side effects
+DEFAULT_KEEPALIVE_REQUEST = TLV(TcatTLVType.APPLICATION.value, bytes()).to_bytes()
+# the phases of opening a session have deadlines of their own
+SESSION_POLICY = RetryPolicy(timeout=None, attempts=5, initial_backoff=1.0,
+                             max_backoff=30.0)
+KEEPALIVE_TIMEOUT = 5.0
+
+
+class ManagedSession:
+    def __init__(self, address: str, ble_sstream: BleStreamSecure, adapter: str = None):
+        self.address = address
+        self.ble_sstream = ble_sstream
+        # reconnects go through the same adapter
+        self.adapter = adapter
+        self.last_used = time.monotonic()
+        self.last_keepalive = self.last_used
+
+    @property
+    def is_connected(self) -> bool:
+        return not self.ble_sstream.peer_closed and \
+            self.ble_sstream.ble_stream.client.is_connected
+
+
+# Owns the secure sessions of the process, keyed by device address. Sessions are
+# reused by later commands, kept alive while idle, reconnected when dropped and
+# closed after idle_ttl seconds without use.
+class ConnectionManager:
+    def __init__(self, adapter: str = None, connect=open_secure_session,
+                 idle_ttl: float = 300.0, keepalive_interval: Optional[float] = 20.0,
+                 keepalive_request: bytes = DEFAULT_KEEPALIVE_REQUEST,
+                 retry_policy: RetryPolicy = SESSION_POLICY):
+        self.adapter = adapter
+        self.idle_ttl = idle_ttl
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_request = keepalive_request
+        self.retry_policy = retry_policy
+        self._connect = connect
+        self._sessions: Dict[str, ManagedSession] = {}
+        self._connecting: Dict[str, asyncio.Future] = {}
+        self._maintenance_task = None
+
+    @property
+    def sessions(self) -> Dict[str, ManagedSession]:
+        return self._sessions
+
+    async def get(self, address: str, max_attempts: int = None,
+                  adapter: str = None) -> BleStreamSecure:
+        # adapter overrides the adapter of the manager for this device
+        self._start_maintenance()
+        session = self._sessions.get(address)
+        if session is not None and session.is_connected:
+            session.last_used = time.monotonic()
+            return session.ble_sstream
+
+        if session is not None:
+            logger.info('Session with %s dropped, reconnecting', address)
+            adapter = adapter or session.adapter
+            await self.close(address)
+        session = await self._open(address, max_attempts, adapter)
+        return session.ble_sstream
+
+    def memory_usage(self) -> Dict[str, int]:
+        return {address: sum(session.ble_sstream.memory_usage().values())
+                for address, session in self._sessions.items()}
+
+    async def close(self, address: str):
+        session = self._sessions.pop(address, None)
+        if session is not None:
+            try:
+                await close_secure_session(session.ble_sstream)
+            except Exception:
+                logger.debug('Closing session with %s failed', address, exc_info=True)
+
+    async def close_all(self):
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        for address in list(self._sessions):
+            await self.close(address)
+
+    async def _open(self, address: str, max_attempts: int = None,
+                    adapter: str = None) -> ManagedSession:
+        # concurrent requests for the same device share one connection attempt
+        future = self._connecting.get(address)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._open_session(address, max_attempts, adapter or self.adapter))
+            self._connecting[address] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done() and self._connecting.get(address) is future:
+                del self._connecting[address]
+
+    async def _open_session(self, address: str, max_attempts: int = None,
+                            adapter: str = None) -> ManagedSession:
+        ble_sstream = await self._connect_with_backoff(address, max_attempts, adapter)
+        session = ManagedSession(address, ble_sstream, adapter)
+        self._sessions[address] = session
+        return session
+
+    async def _connect_with_backoff(self, address: str, max_attempts: int = None,
+                                    adapter: str = None) -> BleStreamSecure:
+        policy = self.retry_policy
+        if max_attempts:
+            policy = policy.with_attempts(max_attempts)
+        return await policy.run(lambda: self._connect(address, adapter=adapter),
+                                f'Opening a session with {address}')
+
+    def _start_maintenance(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.ensure_future(self._maintain())
+
+    async def _maintain(self):
+        period = self.idle_ttl
+        if self.keepalive_interval:
+            period = min(period, self.keepalive_interval)
+        while True:
+            await asyncio.sleep(period / 2)
+            for session in list(self._sessions.values()):
+                try:
+                    await self._maintain_session(session)
+                except Exception:
+                    logger.debug('Maintenance of %s failed', session.address,
+                                 exc_info=True)
+
+    async def _maintain_session(self, session: ManagedSession):
+        now = time.monotonic()
+        if now - session.last_used > self.idle_ttl:
+            logger.info('Closing idle session with %s', session.address)
+            await self.close(session.address)
+            return
+
+        alive = session.is_connected
+        keepalive_due = self.keepalive_interval and \
+            now - max(session.last_used, session.last_keepalive) > self.keepalive_interval
+        # a session busy with a request does not need one
+        if alive and keepalive_due and not session.ble_sstream.queue.busy:
+            session.last_keepalive = now
+            response = await session.ble_sstream.send_with_resp(
+                self.keepalive_request, timeout=KEEPALIVE_TIMEOUT,
+                priority=Priority.BULK)
+            alive = bool(response)
+
+        if not alive:
+            logger.info('Session with %s dropped, reconnecting', session.address)
+            await self.close(session.address)
+            reconnected = await self._open(session.address, adapter=session.adapter)
+            reconnected.last_used = session.last_used
@@ -0,0 +1,106 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'bbtc',
+                                  'devices.json')
+# version 1 files hold the entries of devices only
+CACHE_VERSION = 2
+
+
+# Remembers the address of every device connected to by name, so that the next
+# session can connect directly instead of scanning for the advertisement, and the
+# link calibration of every address, so that it is not measured again.
+class DeviceCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.entries: Dict[str, dict] = {}
+        self.links: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                content = json.load(file)
+        except FileNotFoundError:
+            content = {}
+        except (OSError, ValueError) as e:
+            logger.warning('Ignoring device cache %s: %s', self.path, e)
+            content = {}
+        if not isinstance(content, dict):
+            logger.warning('Ignoring device cache %s: not an object', self.path)
+            content = {}
+        if content.get('version') == CACHE_VERSION:
+            self.entries = content.get('devices', {})
+            self.links = content.get('links', {})
+        else:
+            self.entries = content
+            self.links = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # write a complete file first, a concurrent reader never sees a partial one
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'version': CACHE_VERSION, 'devices': self.entries,
+                       'links': self.links}, file, indent=1)
+        os.replace(temp_path, self.path)
+
+    def lookup(self, name: str) -> Optional[str]:
+        entry = self.entries.get(name)
+        if entry is None or time.time() - entry['last_seen'] > self.max_age:
+            return None
+        return entry['address']
+
+    def lookup_adapter(self, name: str) -> Optional[str]:
+        # the adapter the device was last connected through, if known
+        if self.lookup(name) is None:
+            return None
+        return self.entries[name].get('adapter')
+
+    def store(self, name: str, address: str, adapter: str = None):
+        self.entries[name] = {
+            'address': address,
+            'adapter': adapter,
+            'last_seen': time.time(),
+        }
+        self.save()
+
+    def forget(self, name: str):
+        if self.entries.pop(name, None) is not None:
+            self.save()
+
+    def lookup_link(self, address: str) -> Optional[dict]:
+        link = self.links.get(address.upper())
+        if link is None or time.time() - link['last_seen'] > self.max_age:
+            return None
+        return link
+
+    def store_link(self, address: str, link: dict):
+        self.links[address.upper()] = dict(link, last_seen=time.time())
+        self.save()
+
+    def forget_link(self, address: str):
+        if self.links.pop(address.upper(), None) is not None:
+            self.save()
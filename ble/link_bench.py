@@ -0,0 +1,156 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from ble.ble_session import open_secure_session, close_secure_session
+from ble.ble_stream_secure import TLS_PROFILES
+from ble.link_shaper import LINK_PROFILES, LinkProfile
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+from utils.ndjson import NdjsonWriter, OUTPUT_FORMATS, stdout_records
+
+ROUND_TRIP_REQUEST = TLV(TcatTLVType.APPLICATION.value, b'Hello world!').to_bytes()
+
+
+def percentiles(samples: List[float], fractions: List[float]) -> List[float]:
+    if not samples:
+        return [0.0] * len(fractions)
+    ordered = sorted(samples)
+    return [ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+            for fraction in fractions]
+
+
+class ProfileResult:
+    def __init__(self, name: str, profile: LinkProfile):
+        self.name = name
+        self.profile = profile
+        self.sessions = 0
+        self.failed_sessions = 0
+        self.handshakes: List[float] = []
+        self.round_trips: List[float] = []
+        self.failed_round_trips = 0
+        self.shaping = {'notifications': 0, 'reordered': 0, 'dropped': 0,
+                        'disconnects': 0}
+
+    def to_record(self) -> Dict:
+        handshake_p50, handshake_p90 = percentiles(self.handshakes, [0.5, 0.9])
+        round_trip_p50, round_trip_p90 = percentiles(self.round_trips, [0.5, 0.9])
+        return {
+            'profile': self.name,
+            'link': str(self.profile),
+            'sessions': self.sessions,
+            'failed_sessions': self.failed_sessions,
+            'handshake_p50': handshake_p50,
+            'handshake_p90': handshake_p90,
+            'round_trips': len(self.round_trips),
+            'failed_round_trips': self.failed_round_trips,
+            'round_trip_p50': round_trip_p50,
+            'round_trip_p90': round_trip_p90,
+            **self.shaping,
+        }
+
+    def __str__(self):
+        record = self.to_record()
+        return f'{self.name}: {self.sessions - self.failed_sessions}/{self.sessions} ' \
+            f'session(s), handshake p50 {record["handshake_p50"]:.2f} s ' \
+            f'p90 {record["handshake_p90"]:.2f} s, ' \
+            f'{len(self.round_trips)} round trip(s) p50 ' \
+            f'{record["round_trip_p50"] * 1000:.0f} ms ' \
+            f'p90 {record["round_trip_p90"] * 1000:.0f} ms, ' \
+            f'{self.failed_round_trips} failed, {record["dropped"]} dropped, ' \
+            f'{record["disconnects"]} disconnect(s)'
+
+
+async def run_session(args, result: ProfileResult):
+    result.sessions += 1
+    start_time = time.monotonic()
+    try:
+        ble_sstream = await asyncio.wait_for(
+            open_secure_session(args.mac, adapter=args.adapter,
+                                tls_profile=args.tls_profile,
+                                link_profile=result.profile),
+            args.timeout)
+    except Exception as e:
+        result.failed_sessions += 1
+        logging.info('Session failed: %s', e or type(e).__name__)
+        return
+    result.handshakes.append(time.monotonic() - start_time)
+    try:
+        for _ in range(args.round_trips):
+            start_time = time.monotonic()
+            response = await ble_sstream.send_with_resp(ROUND_TRIP_REQUEST,
+                                                        timeout=args.timeout)
+            if response:
+                result.round_trips.append(time.monotonic() - start_time)
+            else:
+                result.failed_round_trips += 1
+    except Exception as e:
+        result.failed_round_trips += 1
+        logging.info('Round trip failed: %s', e or type(e).__name__)
+    finally:
+        client = ble_sstream.ble_stream.client
+        for field in result.shaping:
+            result.shaping[field] += getattr(client, field)
+        await close_secure_session(ble_sstream)
+
+
+async def run_benchmark(args, records: Optional[NdjsonWriter]) -> int:
+    for name, profile in zip(args.profiles, args.links):
+        result = ProfileResult(name, profile)
+        for _ in range(args.sessions):
+            await run_session(args, result)
+        if records is None:
+            print(result)
+        else:
+            records.write(result.to_record())
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='bbtc.py link-bench',
+        description='Measure the TLS handshake and request round trips with a device '
+        'over links shaped to reproduce different radio conditions.')
+    parser.add_argument('--mac', required=True, help='Address of the device')
+    parser.add_argument('--adapter', help='Bluetooth adapter to use, e.g. hci1')
+    parser.add_argument('--profiles', nargs='+', default=list(LINK_PROFILES),
+                        metavar='PROFILE',
+                        help='Link profiles to sweep: names of '
+                        f'{", ".join(LINK_PROFILES)} and/or FIELD=VALUE pairs, '
+                        'e.g. "weak,seed=2" "latency=0.05,fragment=20"')
+    parser.add_argument('--sessions', type=int, default=5,
+                        help='Sessions opened with every profile')
+    parser.add_argument('--round-trips', type=int, default=10,
+                        help='Requests sent in every session')
+    parser.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS',
+                        help='Deadline of opening a session and of every request')
+    parser.add_argument('--tls-profile', choices=TLS_PROFILES, default='default')
+    parser.add_argument('--results', choices=OUTPUT_FORMATS, default='text',
+                        help='"ndjson" writes one JSON record per profile')
+    args = parser.parse_args(argv)
+    try:
+        args.links = [LinkProfile.parse(profile) for profile in args.profiles]
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.WARNING)
+    with stdout_records(args.results) as records:
+        return asyncio.run(run_benchmark(args, records))
@@ -0,0 +1,90 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import time
+from typing import Dict, List, Optional, Set
+
+WRITE_WITHOUT_RESPONSE = 'without_response'
+WITH_RESPONSE = 'with_response'
+WRITE_MODES = [WRITE_WITHOUT_RESPONSE, WITH_RESPONSE]
+# notifications this small mean that the ATT MTU was not raised from its default
+MIN_NOTIFICATION_SIZE = 20
+
+
+# Link parameters of a device, measured during the TLS handshake of a session: the
+# size of GATT writes and the size of notifications sent by the device. The write
+# mode is not measured, the time of a write says nothing about when its data arrived,
+# and flights of different size and processing cannot be compared. It follows from
+# the properties of the characteristic and from failed writes instead: writes
+# without response, which do not wait for an ATT round trip per chunk, unless the
+# characteristic does not allow them or they failed. The result is stored per device
+# address and reused by later sessions without measuring again.
+class LinkCalibration:
+    def __init__(self, write_mode: str = WRITE_WITHOUT_RESPONSE, write_size: int = 0,
+                 notification_size: int = 0, calibrated: float = None):
+        self.write_mode = write_mode
+        self.write_size = write_size
+        self.notification_size = notification_size
+        self.calibrated = calibrated
+        self.failures: Set[str] = set()
+
+    def __str__(self):
+        return f'writes of {self.write_size} B {self.write_mode}, ' \
+            f'notifications of {self.notification_size} B'
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.failures)
+
+    def choose_write_mode(self, modes: List[str]) -> str:
+        # modes allowed by the characteristic, in the order of WRITE_MODES
+        usable = [mode for mode in modes if mode not in self.failures]
+        self.write_mode = (usable or modes)[0]
+        return self.write_mode
+
+    def record_write(self, size: int):
+        self.write_size = max(self.write_size, size)
+
+    def record_failure(self, mode: str):
+        self.failures.add(mode)
+
+    def record_notification(self, size: int):
+        self.notification_size = max(self.notification_size, size)
+
+    def finish(self) -> 'LinkCalibration':
+        # a mode that failed is not safe to use, the next session takes the other one
+        if self.write_mode in self.failures:
+            others = [mode for mode in WRITE_MODES if mode not in self.failures]
+            if others:
+                self.write_mode = others[0]
+        self.calibrated = time.time()
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'write_mode': self.write_mode,
+            'write_size': self.write_size,
+            'notification_size': self.notification_size,
+            'calibrated': self.calibrated,
+        }
+
+    @staticmethod
+    def from_dict(record: Dict) -> Optional['LinkCalibration']:
+        if record.get('write_mode') not in WRITE_MODES:
+            return None
+        return LinkCalibration(record['write_mode'], record.get('write_size', 0),
+                               record.get('notification_size', 0),
+                               record.get('calibrated'))
@@ -0,0 +1,220 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+from collections import OrderedDict, deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class LinkProfile:
+    FIELDS = {
+        # seconds added to every notification and GATT write
+        'latency': float,
+        # random delay of up to this many seconds added on top of the latency
+        'jitter': float,
+        # notifications are split into fragments of this many bytes, 0 keeps them
+        'fragment': int,
+        # probability of a write completing after later writes
+        'reorder': float,
+        # probabilities, per notification and per GATT write
+        'drop': float,
+        'disconnect': float,
+        'seed': int,
+    }
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, fragment: int = 0,
+                 reorder: float = 0.0, drop: float = 0.0, disconnect: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment = fragment
+        self.reorder = reorder
+        self.drop = drop
+        self.disconnect = disconnect
+        self.seed = seed
+
+    def __str__(self):
+        return ','.join(f'{field}={getattr(self, field)}' for field in LinkProfile.FIELDS)
+
+    def replace(self, **changes) -> 'LinkProfile':
+        fields = {field: getattr(self, field) for field in LinkProfile.FIELDS}
+        fields.update(changes)
+        return LinkProfile(**fields)
+
+    @staticmethod
+    def parse(text: str) -> 'LinkProfile':
+        # a profile name and/or field=value pairs, e.g. 'weak,seed=3' or 'drop=0.01'
+        profile = LinkProfile()
+        changes = {}
+        for item in filter(None, text.split(',')):
+            if '=' not in item:
+                if item not in LINK_PROFILES:
+                    raise ValueError(f'Unknown link profile: {item}')
+                profile = LINK_PROFILES[item]
+                continue
+            field, value = item.split('=', 1)
+            if field not in LinkProfile.FIELDS:
+                raise ValueError(f'Unknown link profile field: {field}')
+            changes[field] = LinkProfile.FIELDS[field](value)
+        return profile.replace(**changes)
+
+
+LINK_PROFILES: Dict[str, LinkProfile] = {
+    'ideal': LinkProfile(),
+    # crowded 2.4 GHz band, short connection events
+    'busy': LinkProfile(latency=0.03, jitter=0.02, fragment=20),
+    # device at the edge of the range, lost packets are retransmitted late
+    'weak': LinkProfile(latency=0.08, jitter=0.12, fragment=20, reorder=0.1),
+    # as weak, with lost data and supervision timeouts
+    'failing': LinkProfile(latency=0.08, jitter=0.12, fragment=20, reorder=0.1,
+                           drop=0.002, disconnect=0.002),
+}
+
+# sessions shaped so far per address, a new session does not repeat the previous link.
+# Addresses not seen for this many others start from the first session again.
+MAX_NUMBERED_ADDRESSES = 16384
+_session_numbers: 'OrderedDict[str, int]' = OrderedDict()
+
+
+def _next_session_number(address: str) -> int:
+    session = _session_numbers.pop(address, 0)
+    _session_numbers[address] = session + 1
+    if len(_session_numbers) > MAX_NUMBERED_ADDRESSES:
+        _session_numbers.popitem(last=False)
+    return session
+
+
+def link_profile_arg(text: str) -> LinkProfile:
+    try:
+        return LinkProfile.parse(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+# Stands in for BleakClient and passes everything to the wrapped client, shaping the
+# link according to a LinkProfile. Data keeps its order in both directions, as on a
+# real link, only write completions are reordered. The random generator is seeded
+# with the profile seed, the device address and the number of the session with the
+# device, so that a run can be repeated.
+class ShapedClient:
+    def __init__(self, client, profile: LinkProfile, address: str = ''):
+        self.client = client
+        self.profile = profile
+        session = _next_session_number(address)
+        self._random = random.Random(f'{profile.seed}:{address}:{session}')
+        self._link_lost = False
+        self._notify_time = 0.0
+        # timers due at the same time may run in any order, fragments are queued
+        self._fragments = deque()
+        self._last_write = None
+        # disconnects of a lost link run in the background, kept here until done
+        self._tasks = set()
+        self.notifications = 0
+        self.reordered = 0
+        self.dropped = 0
+        self.disconnects = 0
+
+    def __str__(self):
+        return f'{self.notifications} notification(s), ' \
+            f'{self.reordered} reordered write(s), {self.dropped} dropped, ' \
+            f'{self.disconnects} disconnect(s)'
+
+    @property
+    def is_connected(self) -> bool:
+        return not self._link_lost and self.client.is_connected
+
+    @property
+    def services(self):
+        return self.client.services
+
+    async def connect(self, **kwargs):
+        await asyncio.sleep(self._delay())
+        result = await self.client.connect(**kwargs)
+        self._link_lost = False
+        return result
+
+    async def disconnect(self):
+        return await self.client.disconnect()
+
+    async def start_notify(self, uuid, callback):
+        await self.client.start_notify(
+            uuid, lambda char, data: self._shape_notification(char, data, callback))
+
+    async def stop_notify(self, uuid):
+        await self.client.stop_notify(uuid)
+
+    async def write_gatt_char(self, char, data, response=False):
+        if not self.is_connected or self._lose_link():
+            raise ConnectionError('Not connected')
+        # later writes are sent after earlier ones, however short their delay
+        previous = self._last_write
+        written = asyncio.get_running_loop().create_future()
+        self._last_write = written
+        try:
+            await asyncio.sleep(self._delay())
+            if previous is not None:
+                await asyncio.shield(previous)
+            if self._random.random() < self.profile.drop:
+                self.dropped += 1
+                if response:
+                    raise TimeoutError('Write not acknowledged')
+            else:
+                await self.client.write_gatt_char(char, data, response)
+        finally:
+            written.set_result(None)
+        if self._random.random() < self.profile.reorder:
+            # completes after the writes issued meanwhile
+            self.reordered += 1
+            await asyncio.sleep(self.profile.latency + self.profile.jitter)
+
+    def _delay(self) -> float:
+        return self.profile.latency + self._random.uniform(0, self.profile.jitter)
+
+    def _lose_link(self) -> bool:
+        if self._random.random() >= self.profile.disconnect:
+            return False
+        logger.info('Shaped link lost')
+        self._link_lost = True
+        self.disconnects += 1
+        task = asyncio.ensure_future(self.client.disconnect())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def _shape_notification(self, char, data: bytearray, callback):
+        if not self.is_connected or self._lose_link():
+            return
+        if self._random.random() < self.profile.drop:
+            self.dropped += 1
+            return
+        size = self.profile.fragment or len(data)
+        loop = asyncio.get_event_loop()
+        for offset in range(0, len(data), size):
+            self.notifications += 1
+            self._notify_time = max(loop.time() + self._delay(), self._notify_time)
+            self._fragments.append((callback, char, data[offset:offset + size]))
+            loop.call_at(self._notify_time, self._deliver)
+
+    def _deliver(self):
+        # one timer per fragment, the earliest queued fragment is due
+        callback, char, data = self._fragments.popleft()
+        if self.is_connected:
+            callback(char, data)
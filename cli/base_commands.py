@@ -14,20 +14,41 @@
    limitations under the License.
 """
 
-from ble.ble_connection_constants import BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, \
-    BBTC_RX_CHAR_UUID, SERVER_COMMON_NAME
-from ble.ble_stream import BleStream
+import asyncio
+
 from ble.ble_stream_secure import BleStreamSecure
 from ble import ble_scanner
+from ble.ble_session import send_tlv_requests
+from ble.command_queue import Priority
+from ble.connection_manager import ConnectionManager
 from tlv.tlv import TLV
 from tlv.tcat_tlv import TcatTLVType
-from cli.command import Command, CommandResultNone, CommandResultTLV
+from cli.command import Command, CommandResultNone, CommandResultTLV, \
+    CommandResultSteps, IDEMPOTENT_COMMAND_POLICY
 from dataset.dataset import ThreadDataset
-from utils import select_device_by_user_input
-from os import path
+from dataset.dataset_validation import check_dataset
+from utils import select_device_by_user_input, profiling
+
+
+async def get_ble_sstream(context) -> BleStreamSecure:
+    # sessions are owned by the connection manager, which reconnects dropped ones
+    address = context['address']
+    if address is not None:
+        context['ble_sstream'] = await context['connection_manager'].get(address)
+    return context['ble_sstream']
+
+
+async def request(bless: BleStreamSecure, data: bytes,
+                  priority=Priority.NORMAL) -> CommandResultTLV:
+    response = await bless.send_with_resp(data, priority=priority)
+    if not response:
+        raise TimeoutError('No response from the device')
+    return CommandResultTLV(TLV.from_bytes(response))
 
 
 class HelpCommand(Command):
+    retry_policy = None
+
     def get_help_string(self) -> str:
         return 'Display help and return.'
 
@@ -40,40 +61,52 @@ class HelpCommand(Command):
 
 
 class HelloCommand(Command):
+    retry_policy = IDEMPOTENT_COMMAND_POLICY
+
     def get_help_string(self) -> str:
         return 'Send round trip "Hello world!" message.'
 
     async def execute_default(self, args, context):
-        bless: BleStreamSecure = context['ble_sstream']
+        bless: BleStreamSecure = await get_ble_sstream(context)
         print('Sending hello world...')
         data = TLV(
             TcatTLVType.APPLICATION.value,
             bytes(
                 'Hello world!',
                 'ascii')).to_bytes()
-        response = await bless.send_with_resp(data)
-        if not response:
-            return
-        tlv_response = TLV.from_bytes(response)
-        return CommandResultTLV(tlv_response)
+        return await request(bless, data)
 
 
 class CommissionCommand(Command):
     def get_help_string(self) -> str:
-        return 'Update the connected device with current dataset.'
+        return 'Update the connected device with current dataset. ' \
+            'Arguments: [--start] to also enable Thread interface.'
 
     async def execute_default(self, args, context):
-        bless: BleStreamSecure = context['ble_sstream']
         dataset: ThreadDataset = context['dataset']
+        # a malformed dataset is rejected before connecting or sending anything
+        check_dataset(dataset)
+        bless: BleStreamSecure = await get_ble_sstream(context)
+
+        with profiling.trace_memory('commission'):
+            return await self.commission(bless, dataset, args)
 
+    async def commission(self, bless: BleStreamSecure, dataset: ThreadDataset, args):
         print('Commissioning...')
         dataset_bytes = dataset.to_bytes()
-        data = TLV(TcatTLVType.ACTIVE_DATASET.value, dataset_bytes).to_bytes()
-        response = await bless.send_with_resp(data)
-        if not response:
-            return
-        tlv_response = TLV.from_bytes(response)
-        return CommandResultTLV(tlv_response)
+        dataset_tlv = TLV(TcatTLVType.ACTIVE_DATASET.value, dataset_bytes)
+        if '--start' in args:
+            return await self.commission_and_start(bless, dataset_tlv)
+
+        return await request(bless, dataset_tlv.to_bytes())
+
+    async def commission_and_start(self, bless: BleStreamSecure, dataset_tlv: TLV):
+        # both requests are sent in one TLS record, saving a round trip
+        print('Enabling Thread...')
+        requests = [dataset_tlv, TLV(TcatTLVType.THREAD_START.value, bytes())]
+        responses = await send_tlv_requests(bless, requests)
+        responses += [None] * (len(requests) - len(responses))
+        return CommandResultSteps(list(zip(['Commission', 'Thread start'], responses)))
 
 
 class ThreadStartCommand(Command):
@@ -81,17 +114,13 @@ class ThreadStartCommand(Command):
         return 'Enable thread interface.'
 
     async def execute_default(self, args, context):
-        bless: BleStreamSecure = context['ble_sstream']
+        bless: BleStreamSecure = await get_ble_sstream(context)
 
         print('Enabling Thread...')
         data = TLV(
             TcatTLVType.THREAD_START.value, bytes()
         ).to_bytes()
-        response = await bless.send_with_resp(data)
-        if not response:
-            return
-        tlv_response = TLV.from_bytes(response)
-        return CommandResultTLV(tlv_response)
+        return await request(bless, data, Priority.CONTROL)
 
 
 class ThreadStopCommand(Command):
@@ -99,19 +128,35 @@ class ThreadStopCommand(Command):
         return 'Disable thread interface.'
 
     async def execute_default(self, args, context):
-        bless: BleStreamSecure = context['ble_sstream']
+        bless: BleStreamSecure = await get_ble_sstream(context)
         print('Disabling Thread...')
         data = TLV(
             TcatTLVType.THREAD_STOP.value, bytes()
         ).to_bytes()
-        response = await bless.send_with_resp(data)
-        if not response:
-            return
-        tlv_response = TLV.from_bytes(response)
-        return CommandResultTLV(tlv_response)
+        return await request(bless, data, Priority.CONTROL)
+
+
+class DecommissionCommand(Command):
+    def get_help_string(self) -> str:
+        return 'Decommission the connected device, removing its Thread network ' \
+            'credentials.'
+
+    async def execute_default(self, args, context):
+        bless: BleStreamSecure = await get_ble_sstream(context)
+        print('Decommissioning...')
+        data = TLV(TcatTLVType.DECOMMISSION.value, bytes()).to_bytes()
+        try:
+            return await request(bless, data, Priority.CONTROL)
+        finally:
+            # the device resets, also when the response was lost, the next command
+            # opens a new session
+            if context['address'] is not None:
+                await context['connection_manager'].close(context['address'])
 
 
 class ThreadStateCommand(Command):
+    retry_policy = IDEMPOTENT_COMMAND_POLICY
+
     def __init__(self):
         self._subcommands = {
             'start': ThreadStartCommand(),
@@ -127,33 +172,28 @@ class ThreadStateCommand(Command):
 
 
 class ScanCommand(Command):
+    # waits for the user to select the device
+    retry_policy = None
+
     def get_help_string(self) -> str:
         return 'Perform scan for TCAT devices.'
 
     async def execute_default(self, args, context):
-        if not (context['ble_sstream'] is None):
-            del context['ble_sstream']
-
-        tcat_devices = await ble_scanner.scan_tcat_devices()
-        device = select_device_by_user_input(tcat_devices)
+        manager: ConnectionManager = context['connection_manager']
+        tcat_devices = await ble_scanner.scan_tcat_devices(adapter=manager.adapter)
+        # waiting for the user on the loop would stall the keep-alives of the sessions
+        device = await asyncio.get_running_loop().run_in_executor(
+            None, select_device_by_user_input, tcat_devices)
 
         if device is None:
             return CommandResultNone()
 
-        ble_sstream = None
-
-        print(f'Connecting to {device}')
-        ble_stream = await BleStream.create(
-            device.address, BBTC_SERVICE_UUID, BBTC_TX_CHAR_UUID, BBTC_RX_CHAR_UUID
-        )
-        ble_sstream = BleStreamSecure(ble_stream)
-        ble_sstream.load_cert(
-            certfile=path.join('auth', 'commissioner_cert.pem'),
-            keyfile=path.join('auth', 'commissioner_key.pem'),
-            cafile=path.join('auth', 'ca_cert.pem'),
-        )
-
-        print('Setting up secure channel...')
-        await ble_sstream.do_handshake(hostname=SERVER_COMMON_NAME)
+        print(f'Connecting to {device} and setting up secure channel...')
+        context['ble_sstream'] = await manager.get(device.address)
+        previous = context['address']
+        context['address'] = device.address
+        # only the active device is kept connected
+        if previous is not None and previous != device.address:
+            await manager.close(previous)
         print('Done')
-        context['ble_sstream'] = ble_sstream
+        return CommandResultNone()
@@ -17,10 +17,12 @@
 import readline
 import shlex
 from ble.ble_stream_secure import BleStreamSecure
+from ble.connection_manager import ConnectionManager
 from cli.base_commands import (
     HelpCommand,
     HelloCommand,
     CommissionCommand,
+    DecommissionCommand,
     ThreadStateCommand,
     ScanCommand
 )
@@ -29,15 +31,19 @@ from cli.dataset_commands import (
 )
 from dataset.dataset import ThreadDataset
 from typing import Optional
+from utils import profiling
 
 
 class CLI:
     def __init__(self, dataset: ThreadDataset,
-                 ble_sstream: Optional[BleStreamSecure] = None):
+                 ble_sstream: Optional[BleStreamSecure] = None,
+                 connection_manager: Optional[ConnectionManager] = None,
+                 address: Optional[str] = None):
         self._commands = {
             'help': HelpCommand(),
             'hello': HelloCommand(),
             'commission': CommissionCommand(),
+            'decommission': DecommissionCommand(),
             'dataset': DatasetCommand(),
             'thread': ThreadStateCommand(),
             'scan': ScanCommand(),
@@ -45,7 +51,9 @@ class CLI:
         self._context = {
             'ble_sstream': ble_sstream,
             'dataset': dataset,
-            'commands': self._commands
+            'commands': self._commands,
+            'connection_manager': connection_manager or ConnectionManager(),
+            'address': address
         }
         readline.set_completer(self.completer)
         readline.parse_and_bind('tab: complete')
@@ -95,4 +103,16 @@ class CLI:
         if command not in self._commands.keys():
             raise Exception('Invalid command: {}'.format(command))
 
-        return await self._commands[command].execute(args, self._context)
+        handler = self._commands[command]
+        policy = handler.retry_policy
+        with profiling.profile('evaluate_input'):
+            if policy is None:
+                return await handler.execute(args, self._context)
+            return await policy.run(lambda: handler.execute(args, self._context),
+                                    f'Command "{command}"', self._reset_session)
+
+    async def _reset_session(self):
+        # a late response to the failed attempt must not be taken for the next one
+        address = self._context['address']
+        if address is not None:
+            await self._context['connection_manager'].close(address)
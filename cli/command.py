@@ -16,8 +16,10 @@
 
 from tlv.tlv import TLV
 from tlv.tcat_tlv import TcatTLVType
+from utils.retry import RetryPolicy
 
 from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
 
 
 class CommandResult(ABC):
@@ -28,8 +30,23 @@ class CommandResult(ABC):
     def pretty_print(self):
         pass
 
+    @abstractmethod
+    def to_record(self) -> Optional[dict]:
+        # structured form of the result, None if there is nothing to report
+        pass
+
+
+# covers reconnecting to the device as well
+COMMAND_POLICY = RetryPolicy(timeout=60.0)
+# for requests which can be repeated without harm
+IDEMPOTENT_COMMAND_POLICY = RetryPolicy(timeout=60.0, attempts=2)
+
 
 class Command(ABC):
+    # deadline and retries of the command when entered in the CLI, subcommands run
+    # under the policy of the command. None for commands not using the link.
+    retry_policy: Optional[RetryPolicy] = COMMAND_POLICY
+
     def __init__(self):
         self._subcommands = {}
 
@@ -64,13 +81,26 @@ class Command(ABC):
                 sc.print_help()
 
 
+def tlv_record(tlv: TLV) -> dict:
+    tlv_type = TcatTLVType.from_value(tlv.type)
+    record = {
+        'type': tlv_type.name if tlv_type is not None else tlv.type,
+        'length': len(tlv.value),
+    }
+    if tlv_type == TcatTLVType.APPLICATION:
+        record['value'] = tlv.value.decode('ascii', errors='replace')
+    else:
+        record['value'] = tlv.value.hex()
+    return record
+
+
 class CommandResultTLV(CommandResult):
     def pretty_print(self):
         tlv: TLV = self.value
         tlv_type = TcatTLVType.from_value(tlv.type)
         print('Result: TLV:')
         if tlv_type is not None:
-            print(f'\tTYPE:\t{TcatTLVType.from_value(tlv.type).name}')
+            print(f'\tTYPE:\t{tlv_type.name}')
         else:
             print(f'\tTYPE:\tunknown: {hex(tlv.type)} ({tlv.type})')
         print(f'\tLEN:\t{len(tlv.value)}')
@@ -79,7 +109,40 @@ class CommandResultTLV(CommandResult):
         else:
             print(f'\tVALUE:\t0x{tlv.value.hex()}')
 
+    def to_record(self) -> dict:
+        return tlv_record(self.value)
+
+
+class CommandResultSteps(CommandResult):
+    def __init__(self, steps: List[Tuple[str, Optional[TLV]]]):
+        super().__init__(steps)
+
+    def pretty_print(self):
+        for name, tlv in self.value:
+            print(f'{name}:')
+            if tlv is None:
+                print('\tNo response.')
+            else:
+                CommandResultTLV(tlv).pretty_print()
+
+    def to_record(self) -> dict:
+        return {'steps': [{'name': name,
+                           'response': tlv_record(tlv) if tlv is not None else None}
+                          for name, tlv in self.value]}
+
+
+class CommandResultDataset(CommandResult):
+    # a whole ThreadDataset or one of its entries
+    def pretty_print(self):
+        self.value.print_content()
+
+    def to_record(self) -> dict:
+        return self.value.to_dict()
+
 
 class CommandResultNone(CommandResult):
     def pretty_print(self):
         pass
+
+    def to_record(self) -> None:
+        return None
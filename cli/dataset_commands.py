@@ -14,7 +14,7 @@
    limitations under the License.
 """
 
-from cli.command import Command, CommandResultNone
+from cli.command import Command, CommandResultDataset, CommandResultNone
 from dataset.dataset import ThreadDataset, initial_dataset
 from tlv.dataset_tlv import MeshcopTlvType
 
@@ -22,8 +22,7 @@ from tlv.dataset_tlv import MeshcopTlvType
 def handle_dataset_entry_command(type: MeshcopTlvType, args, context):
     ds: ThreadDataset = context['dataset']
     if len(args) == 0:
-        ds.get_entry(type).print_content()
-        return CommandResultNone()
+        return CommandResultDataset(ds.get_entry(type))
 
     ds.set_entry(type, args)
     print('Done.')
@@ -165,6 +164,8 @@ class SecurityPolicyCommand(Command):
 
 
 class DatasetCommand(Command):
+    retry_policy = None
+
     def __init__(self):
         self._subcommands = {
             'help': DatasetHelpCommand(),
@@ -190,5 +191,4 @@ class DatasetCommand(Command):
 
     async def execute_default(self, args, context):
         ds: ThreadDataset = context['dataset']
-        ds.print_content()
-        return CommandResultNone()
+        return CommandResultDataset(ds)
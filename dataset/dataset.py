@@ -42,9 +42,9 @@ initial_dataset = bytes(
 
 
 class ThreadDataset:
-    def __init__(self):
+    def __init__(self, data: bytes = initial_dataset):
         self.entries: Dict[MeshcopTlvType, DatasetEntry] = {}
-        self.set_from_bytes(initial_dataset)
+        self.set_from_bytes(data)
 
     def print_content(self):
         for type, entry in self.entries.items():
@@ -52,11 +52,16 @@ class ThreadDataset:
             entry.print_content(indent=1)
             print()
 
+    def to_dict(self):
+        return {type.name: entry.to_dict() for type, entry in self.entries.items()}
+
     def set_from_bytes(self, bytes):
+        entries = {}
         for tlv in TLV.parse_tlvs(bytes):
             type = MeshcopTlvType.from_value(tlv.type)
-            self.entries[type] = create_dataset_entry(type)
-            self.entries[type].set_from_tlv(tlv)
+            entries[type] = create_dataset_entry(type)
+            entries[type].set_from_tlv(tlv)
+        self.entries = entries
 
     def to_bytes(self):
         res = bytes()
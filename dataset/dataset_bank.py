@@ -0,0 +1,258 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import fileinput
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_validation import check_dataset
+
+BANK_MAGIC = b'BBTCDSB1'
+# magic, number of datasets, number of devices, digest of both tables
+HEADER = struct.Struct('<8sII32s')
+# SHA-256 of the encoded dataset, its offset and length, sorted by the digest
+DATASET_ENTRY = struct.Struct('<32sQI')
+# device key and number of its dataset in the dataset table, sorted by the key
+DEVICE_ENTRY = struct.Struct('<16sI')
+DEVICE_KEY_LEN = 16
+
+
+def device_key(device_id: str) -> bytes:
+    # Bluetooth addresses, or the UUIDs macOS uses in their place
+    digits = device_id.replace(':', '').replace('-', '')
+    if len(digits) not in (12, 32):
+        raise ValueError(f'Not a device address: {device_id}')
+    try:
+        return bytes.fromhex(digits).rjust(DEVICE_KEY_LEN, b'\0')
+    except ValueError:
+        raise ValueError(f'Not a device address: {device_id}')
+
+
+def write_bank(path: str, devices: Iterable[Tuple[str, bytes]]):
+    datasets: Dict[bytes, bytes] = {}
+    index: Dict[bytes, bytes] = {}
+    for device_id, data in devices:
+        digest = hashlib.sha256(data).digest()
+        datasets.setdefault(digest, bytes(data))
+        index[device_key(device_id)] = digest
+
+    digests = sorted(datasets)
+    numbers = {digest: number for number, digest in enumerate(digests)}
+    offset = HEADER.size + len(digests) * DATASET_ENTRY.size + \
+        len(index) * DEVICE_ENTRY.size
+    tables = bytearray()
+    for digest in digests:
+        tables += DATASET_ENTRY.pack(digest, offset, len(datasets[digest]))
+        offset += len(datasets[digest])
+    for key in sorted(index):
+        tables += DEVICE_ENTRY.pack(key, numbers[index[key]])
+
+    # written next to the bank and renamed, readers never see a partial file
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(BANK_MAGIC, len(digests), len(index),
+                               hashlib.sha256(tables).digest()))
+        file.write(tables)
+        for digest in digests:
+            file.write(datasets[digest])
+    os.replace(temp_path, path)
+
+
+# Read-only view of a bank file. The file is mapped to memory, so opening it reads
+# the header only and lookups touch just the pages they search. With verify, the
+# digest of the tables and the size of the file are checked on opening as well,
+# which reads all tables. Datasets are returned as memoryviews of the mapping, valid
+# until the bank is closed, and are checked against their digest every time.
+class DatasetBank:
+    def __init__(self, path: str, verify: bool = False):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        try:
+            self._check_header()
+            if verify:
+                self._verify()
+        except ValueError:
+            self.close()
+            raise
+
+    def _check_header(self):
+        if len(self._mmap) < HEADER.size:
+            raise ValueError('Not a dataset bank')
+        magic, self.dataset_count, self.device_count, self.digest = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != BANK_MAGIC:
+            raise ValueError('Not a dataset bank')
+        self._datasets_offset = HEADER.size
+        self._devices_offset = HEADER.size + self.dataset_count * DATASET_ENTRY.size
+        self._tables_end = self._devices_offset + self.device_count * DEVICE_ENTRY.size
+        if len(self._mmap) < self._tables_end:
+            raise ValueError('Dataset bank is truncated')
+
+    def _verify(self):
+        tables_end = self._tables_end
+        if hashlib.sha256(self._view[HEADER.size:tables_end]).digest() != self.digest:
+            raise ValueError('Dataset bank is corrupted')
+        # datasets follow the tables back to back, up to the end of the file
+        size = tables_end + sum(
+            DATASET_ENTRY.unpack_from(self._mmap, self._datasets_offset +
+                                      number * DATASET_ENTRY.size)[2]
+            for number in range(self.dataset_count))
+        if len(self._mmap) != size:
+            raise ValueError(f'Dataset bank has {len(self._mmap)} bytes, '
+                             f'expected {size}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.device_count
+
+    def close(self):
+        # fails while views of the datasets are still held
+        self._view.release()
+        self._mmap.close()
+
+    def _search(self, offset: int, entry_size: int, count: int,
+                key: bytes) -> Optional[int]:
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = offset + middle * entry_size
+            current = self._mmap[position:position + len(key)]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _dataset(self, number: int) -> memoryview:
+        digest, offset, length = DATASET_ENTRY.unpack_from(
+            self._mmap, self._datasets_offset + number * DATASET_ENTRY.size)
+        view = self._view[offset:offset + length]
+        if hashlib.sha256(view).digest() != digest:
+            view.release()
+            raise ValueError(f'Dataset {digest.hex()} of the bank is corrupted')
+        return view
+
+    def _device_entry(self, device_id: str) -> Optional[int]:
+        return self._search(self._devices_offset, DEVICE_ENTRY.size,
+                            self.device_count, device_key(device_id))
+
+    def __contains__(self, device_id: str) -> bool:
+        return self._device_entry(device_id) is not None
+
+    def lookup(self, device_id: str) -> Optional[memoryview]:
+        entry = self._device_entry(device_id)
+        if entry is None:
+            return None
+        _, number = DEVICE_ENTRY.unpack_from(
+            self._mmap, self._devices_offset + entry * DEVICE_ENTRY.size)
+        return self._dataset(number)
+
+    def get(self, digest: bytes) -> Optional[memoryview]:
+        number = self._search(self._datasets_offset, DATASET_ENTRY.size,
+                              self.dataset_count, digest)
+        return self._dataset(number) if number is not None else None
+
+    def datasets(self) -> Iterator[Tuple[bytes, memoryview]]:
+        for number in range(self.dataset_count):
+            position = self._datasets_offset + number * DATASET_ENTRY.size
+            yield self._mmap[position:position + 32], self._dataset(number)
+
+
+def read_devices(files: List[str]) -> Iterator[Tuple[str, bytes]]:
+    with fileinput.input(files) as lines:
+        for line in lines:
+            parts = line.split()
+            if not parts:
+                continue
+            position = f'{lines.filename()}:{lines.filelineno()}'
+            if len(parts) != 2:
+                raise ValueError(f'{position}: expected "<device> <hex>"')
+            try:
+                yield parts[0], bytes.fromhex(parts[1])
+            except ValueError as e:
+                raise ValueError(f'{position}: {e}')
+
+
+def build(args) -> int:
+    devices = list(read_devices(args.files))
+    # every distinct dataset is validated once
+    errors = 0
+    for data in {data for _, data in devices}:
+        try:
+            check_dataset(ThreadDataset(data))
+        except Exception as e:
+            errors += 1
+            print(f'{data.hex()}: {e}', file=sys.stderr)
+    if errors:
+        print(f'{errors} invalid dataset(s), no bank written.', file=sys.stderr)
+        return 1
+    write_bank(args.output, devices)
+    with DatasetBank(args.output, verify=True) as bank:
+        print(f'{len(bank)} device(s), {bank.dataset_count} distinct dataset(s).')
+    return 0
+
+
+def lookup(args) -> int:
+    with DatasetBank(args.bank, verify=True) as bank:
+        found = True
+        for device_id in args.devices:
+            dataset = bank.lookup(device_id)
+            if dataset is None:
+                found = False
+                print(f'{device_id}: not in the bank', file=sys.stderr)
+            else:
+                print(f'{device_id} {dataset.hex()}')
+                dataset.release()
+    return 0 if found else 1
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='bbtc.py dataset-bank',
+        description='Store the datasets of many devices, each distinct dataset once.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser(
+        'build', help='Build a bank from lines of "<device> <hex dataset>".')
+    build_parser.add_argument('--output', required=True, help='Bank file to write')
+    build_parser.add_argument('files', nargs='*',
+                              help='Input files, standard input if none are given')
+    build_parser.set_defaults(handler=build)
+    lookup_parser = subparsers.add_parser(
+        'lookup', help='Print the datasets of devices as hex.')
+    lookup_parser.add_argument('bank', help='Bank file')
+    lookup_parser.add_argument('devices', nargs='+', help='Device addresses')
+    lookup_parser.set_defaults(handler=lookup)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
@@ -30,7 +30,7 @@ class DatasetEntry(ABC):
         self.maxlen = None
 
     def print_content(self, indent: int = 0, excluded_fields: List[str] = []):
-        excluded_fields += ['length', 'maxlen', 'type']
+        excluded_fields = excluded_fields + ['length', 'maxlen', 'type']
         indentation = " " * 4 * indent
         for attr_name in dir(self):
             if not attr_name.startswith('_') and attr_name not in excluded_fields:
@@ -40,6 +40,18 @@ class DatasetEntry(ABC):
                         value = value.hex()
                     print(f'{indentation}{attr_name}: {value}')
 
+    def to_dict(self, excluded_fields: List[str] = []):
+        excluded_fields = excluded_fields + ['length', 'maxlen', 'type']
+        res = {}
+        for attr_name in dir(self):
+            if not attr_name.startswith('_') and attr_name not in excluded_fields:
+                value = getattr(self, attr_name)
+                if not inspect.ismethod(value):
+                    if isinstance(value, bytes):
+                        value = value.hex()
+                    res[attr_name] = value
+        return res
+
     @abstractmethod
     def to_tlv(self) -> TLV:
         pass
@@ -64,13 +76,13 @@ class ActiveTimestamp(DatasetEntry):
     def set(self, args: List[str]):
         if len(args) == 0:
             raise ValueError('No argument for ActiveTimestamp')
-        self._seconds = int(args[0])
+        self.seconds = int(args[0])
 
     def set_from_tlv(self, tlv: TLV):
         (value,) = struct.unpack('>Q', tlv.value)
         self.ubit = value & 0x1
         self.ticks = (value >> 1) & 0x7FFF
-        self.seconds = (value >> 16) & 0xFFFF
+        self.seconds = (value >> 16) & 0xFFFFFFFFFFFF
 
     def to_tlv(self):
         value = (self.seconds << 16) | (self.ticks << 1) | self.ubit
@@ -89,13 +101,13 @@ class PendingTimestamp(DatasetEntry):
     def set(self, args: List[str]):
         if len(args) == 0:
             raise ValueError('No argument for PendingTimestamp')
-        self._seconds = int(args[0])
+        self.seconds = int(args[0])
 
     def set_from_tlv(self, tlv: TLV):
         (value,) = struct.unpack('>Q', tlv.value)
         self.ubit = value & 0x1
         self.ticks = (value >> 1) & 0x7FFF
-        self.seconds = (value >> 16) & 0xFFFF
+        self.seconds = (value >> 16) & 0xFFFFFFFFFFFF
 
     def to_tlv(self):
         value = (self.seconds << 16) | (self.ticks << 1) | self.ubit
@@ -223,7 +235,7 @@ class DelayTimer(DatasetEntry):
         self.time_remaining = dt
 
     def set_from_tlv(self, tlv: TLV):
-        self.time_remaining = tlv.value
+        self.time_remaining = int.from_bytes(tlv.value, byteorder='big')
 
     def to_tlv(self):
         value = self.time_remaining
@@ -431,6 +443,9 @@ class ChannelMask(DatasetEntry):
             print(f'{indentation}ChannelMaskEntry {i}')
             entry.print_content(indent=indent + 1)
 
+    def to_dict(self):
+        return {'entries': [entry.to_dict() for entry in self.entries]}
+
     def set_from_tlv(self, tlv: TLV):
         self.entries = []
         for mask_entry_tlv in TLV.parse_tlvs(tlv.value):
@@ -464,23 +479,24 @@ class ChannelMaskEntry(DatasetEntry):
         return TLV.from_bytes(tlv)
 
 
+ENTRY_CLASSES = {
+    MeshcopTlvType.ACTIVETIMESTAMP: ActiveTimestamp,
+    MeshcopTlvType.PENDINGTIMESTAMP: PendingTimestamp,
+    MeshcopTlvType.NETWORKKEY: NetworkKey,
+    MeshcopTlvType.NETWORKNAME: NetworkName,
+    MeshcopTlvType.EXTPANID: ExtPanID,
+    MeshcopTlvType.MESHLOCALPREFIX: MeshLocalPrefix,
+    MeshcopTlvType.DELAYTIMER: DelayTimer,
+    MeshcopTlvType.PANID: PanID,
+    MeshcopTlvType.CHANNEL: Channel,
+    MeshcopTlvType.PSKC: Pskc,
+    MeshcopTlvType.SECURITYPOLICY: SecurityPolicy,
+    MeshcopTlvType.CHANNELMASK: ChannelMask
+}
+
+
 def create_dataset_entry(type: MeshcopTlvType, args=None):
-    entry_classes = {
-        MeshcopTlvType.ACTIVETIMESTAMP: ActiveTimestamp,
-        MeshcopTlvType.PENDINGTIMESTAMP: PendingTimestamp,
-        MeshcopTlvType.NETWORKKEY: NetworkKey,
-        MeshcopTlvType.NETWORKNAME: NetworkName,
-        MeshcopTlvType.EXTPANID: ExtPanID,
-        MeshcopTlvType.MESHLOCALPREFIX: MeshLocalPrefix,
-        MeshcopTlvType.DELAYTIMER: DelayTimer,
-        MeshcopTlvType.PANID: PanID,
-        MeshcopTlvType.CHANNEL: Channel,
-        MeshcopTlvType.PSKC: Pskc,
-        MeshcopTlvType.SECURITYPOLICY: SecurityPolicy,
-        MeshcopTlvType.CHANNELMASK: ChannelMask
-    }
-
-    entry_class = entry_classes.get(type)
+    entry_class = ENTRY_CLASSES.get(type)
     if not entry_class:
         raise ValueError(f"Invalid configuration type: {type}")
 
@@ -0,0 +1,137 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import fileinput
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_validation import check_dataset
+from tlv.dataset_tlv import MeshcopTlvType
+
+MODES = ['decode', 'validate', 'rewrite']
+
+Modification = Tuple[MeshcopTlvType, List[str]]
+# (position, success, output or error message)
+LineResult = Tuple[str, bool, Optional[str]]
+
+
+def parse_modification(text: str) -> Modification:
+    name, separator, value = text.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f'Expected FIELD=VALUE, got "{text}"')
+    try:
+        type = MeshcopTlvType[name.strip().upper()]
+    except KeyError:
+        raise argparse.ArgumentTypeError(f'Unknown dataset field: {name}')
+    return (type, value.split())
+
+
+def process_line(mode: str, modifications: List[Modification],
+                 line: str) -> Optional[str]:
+    ds = ThreadDataset(bytes.fromhex(line))
+    for type, args in modifications:
+        # entries strip the '0x' prefix in place, do not let it leak between lines
+        ds.set_entry(type, list(args))
+
+    if mode == 'decode':
+        return json.dumps(ds.to_dict())
+
+    encoded = ds.to_bytes()
+    if mode == 'validate':
+        check_dataset(ds)
+    elif mode == 'rewrite':
+        return encoded.hex()
+    return None
+
+
+def process_chunk(mode: str, modifications: List[Modification],
+                  chunk: List[Tuple[str, str]]) -> List[LineResult]:
+    res: List[LineResult] = []
+    for position, line in chunk:
+        try:
+            res.append((position, True, process_line(mode, modifications, line)))
+        except Exception as e:
+            res.append((position, False, str(e) or type(e).__name__))
+    return res
+
+
+def process_lines(lines: Iterable[Tuple[str, str]], mode: str,
+                  modifications: List[Modification], jobs: int,
+                  chunk_size: int) -> Iterator[LineResult]:
+    chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # results are yielded in input order, limit the chunks in flight
+        # so that memory use does not depend on the input size
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(process_chunk, mode, modifications, chunk))
+            if len(pending) >= jobs * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def read_lines(files: List[str]) -> Iterator[Tuple[str, str]]:
+    with fileinput.input(files) as lines:
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield (f'{lines.filename()}:{lines.filelineno()}', line)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='bbtc.py dataset-tool',
+        description='Decode, validate and rewrite hex encoded datasets in bulk.')
+    parser.add_argument('mode', choices=MODES,
+                        help='decode: print datasets as JSON, '
+                        'validate: report datasets not valid as an active '
+                        'dataset only, '
+                        'rewrite: print re-encoded datasets as hex')
+    parser.add_argument('files', nargs='*',
+                        help='Files with one hex dataset per line. '
+                        'Standard input is read if none are given.')
+    parser.add_argument('--set', dest='modifications', action='append', default=[],
+                        type=parse_modification, metavar='FIELD=VALUE',
+                        help='Modify a dataset field before processing, '
+                        'e.g. --set networkname=MyNet. May be repeated.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Number of datasets sent to a worker at once')
+    args = parser.parse_intermixed_args(argv)
+
+    errors = 0
+    results = process_lines(read_lines(args.files), args.mode, args.modifications,
+                            max(args.jobs, 1), max(args.chunk_size, 1))
+    for position, success, text in results:
+        if not success:
+            errors += 1
+            sys.stderr.write(f'{position}: {text}\n')
+        elif text is not None:
+            sys.stdout.write(text + '\n')
+    sys.stdout.flush()
+
+    if args.mode == 'validate':
+        print(f'{errors} invalid dataset(s) found.', file=sys.stderr)
+    return 1 if errors else 0
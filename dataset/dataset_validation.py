@@ -0,0 +1,161 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_entries import DatasetEntry
+from tlv.dataset_tlv import MeshcopTlvType
+
+# returns a description of the problem, None if the entry is valid
+Validator = Callable[[DatasetEntry], Optional[str]]
+
+# entries a device needs to form or join a network with an active dataset
+ACTIVE_DATASET_FIELDS = [
+    MeshcopTlvType.ACTIVETIMESTAMP,
+    MeshcopTlvType.CHANNEL,
+    MeshcopTlvType.CHANNELMASK,
+    MeshcopTlvType.EXTPANID,
+    MeshcopTlvType.MESHLOCALPREFIX,
+    MeshcopTlvType.NETWORKKEY,
+    MeshcopTlvType.NETWORKNAME,
+    MeshcopTlvType.PANID,
+    MeshcopTlvType.PSKC,
+    MeshcopTlvType.SECURITYPOLICY,
+]
+
+# channel page 0 holds the 2.4 GHz channels
+PAGE_0_CHANNELS = range(11, 27)
+PAGE_0_MASK_LENGTH = 4
+
+
+def int_field(name: str, low: int, high: int) -> Validator:
+    def validate(entry):
+        value = getattr(entry, name)
+        if not isinstance(value, int) or not low <= value <= high:
+            return f'{name} must be an integer from {low} to {high}, got {value!r}'
+        return None
+    return validate
+
+
+def hex_field(name: str, min_bytes: int, max_bytes: int) -> Validator:
+    pattern = re.compile(f'(?:[0-9a-fA-F]{{2}}){{{min_bytes},{max_bytes}}}')
+    size = f'{min_bytes}' if min_bytes == max_bytes else f'{min_bytes} to {max_bytes}'
+
+    def validate(entry):
+        value = getattr(entry, name)
+        if not isinstance(value, str) or pattern.fullmatch(value) is None:
+            return f'{name} must be {size} bytes in hex, got {value!r}'
+        return None
+    return validate
+
+
+def text_field(name: str, min_bytes: int, max_bytes: int) -> Validator:
+    def validate(entry):
+        value = getattr(entry, name)
+        if not isinstance(value, str) or \
+                not min_bytes <= len(value.encode('utf-8')) <= max_bytes:
+            return f'{name} must be {min_bytes} to {max_bytes} bytes of UTF-8, ' \
+                f'got {value!r}'
+        return None
+    return validate
+
+
+def bit_fields(*names: str) -> List[Validator]:
+    return [int_field(name, 0, 1) for name in names]
+
+
+def validate_channel(entry) -> Optional[str]:
+    if entry.channel_page == 0 and entry.channel not in PAGE_0_CHANNELS:
+        return f'channel {entry.channel} is not a channel of page 0'
+    return None
+
+
+def validate_panid(entry) -> Optional[str]:
+    if entry.data.lower() == 'ffff':
+        return 'ffff is the broadcast PAN ID'
+    return None
+
+
+def validate_channel_mask(entry) -> Optional[str]:
+    for mask_entry in entry.entries:
+        mask = mask_entry.channel_mask
+        if not isinstance(mask, bytes) or len(mask) > 0xFF:
+            return f'channel mask of page {mask_entry.channel_page} is invalid'
+        if not 0 <= mask_entry.channel_page <= 0xFF:
+            return f'channel page {mask_entry.channel_page} is out of range'
+        if mask_entry.channel_page == 0 and len(mask) != PAGE_0_MASK_LENGTH:
+            return f'channel mask of page 0 must be {PAGE_0_MASK_LENGTH} bytes'
+    return None
+
+
+TIMESTAMP_VALIDATORS = [
+    int_field('seconds', 0, 0xFFFFFFFFFFFF),
+    int_field('ticks', 0, 0x7FFF),
+    int_field('ubit', 0, 1),
+]
+
+# Validators run in order and are built once, validating a dataset is a table
+# lookup and a few comparisons per entry
+VALIDATORS: Dict[MeshcopTlvType, Sequence[Validator]] = {
+    MeshcopTlvType.ACTIVETIMESTAMP: TIMESTAMP_VALIDATORS,
+    MeshcopTlvType.PENDINGTIMESTAMP: TIMESTAMP_VALIDATORS,
+    MeshcopTlvType.NETWORKKEY: [hex_field('data', 16, 16)],
+    MeshcopTlvType.NETWORKNAME: [text_field('data', 1, 16)],
+    MeshcopTlvType.EXTPANID: [hex_field('data', 8, 8)],
+    MeshcopTlvType.MESHLOCALPREFIX: [hex_field('data', 8, 8)],
+    MeshcopTlvType.DELAYTIMER: [int_field('time_remaining', 0, 0xFFFFFFFF)],
+    MeshcopTlvType.PANID: [hex_field('data', 2, 2), validate_panid],
+    MeshcopTlvType.CHANNEL: [
+        int_field('channel_page', 0, 0xFF),
+        int_field('channel', 0, 0xFFFF),
+        validate_channel,
+    ],
+    MeshcopTlvType.PSKC: [hex_field('data', 1, 16)],
+    MeshcopTlvType.SECURITYPOLICY: [
+        int_field('rotation_time', 1, 0xFFFF),
+        *bit_fields('out_of_band', 'native', 'routers_1_2', 'external_commissioners',
+                    'reserved', 'commercial_commissioning_off',
+                    'autonomous_enrollment_off', 'networkkey_provisioning_off',
+                    'thread_over_ble', 'non_ccm_routers_off'),
+        int_field('rsv', 0, 0x7),
+        int_field('version_threshold', 0, 0x7),
+    ],
+    MeshcopTlvType.CHANNELMASK: [validate_channel_mask],
+}
+
+
+def validate_dataset(dataset: ThreadDataset,
+                     required: Sequence[MeshcopTlvType] = ACTIVE_DATASET_FIELDS
+                     ) -> List[str]:
+    errors = [f'{type.name}: missing' for type in required
+              if type not in dataset.entries]
+    for type, entry in dataset.entries.items():
+        for validator in VALIDATORS.get(type, ()):
+            error = validator(entry)
+            # later checks of an entry may depend on the earlier ones
+            if error is not None:
+                errors.append(f'{type.name}: {error}')
+                break
+    return errors
+
+
+def check_dataset(dataset: ThreadDataset,
+                  required: Sequence[MeshcopTlvType] = ACTIVE_DATASET_FIELDS):
+    errors = validate_dataset(dataset, required)
+    if errors:
+        raise ValueError('Invalid dataset: ' + '; '.join(errors))
@@ -0,0 +1,165 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import random
+import sys
+from collections import Counter
+from typing import Callable, Dict, List, Set, Tuple
+
+from dataset.dataset import ThreadDataset
+from tlv.dataset_tlv import MeshcopTlvType
+
+PLANNED_FIELDS = [
+    MeshcopTlvType.PANID,
+    MeshcopTlvType.EXTPANID,
+    MeshcopTlvType.MESHLOCALPREFIX,
+]
+DEFAULT_CHANNELS = list(range(11, 27))
+
+# number of possible values and their hex representation, for every planned field
+FIELD_SPACES: Dict[MeshcopTlvType, Tuple[int, Callable[[int], str]]] = {
+    # 0xFFFF is the broadcast PAN ID
+    MeshcopTlvType.PANID: (0xFFFF, lambda value: f'{value:04x}'),
+    MeshcopTlvType.EXTPANID: (1 << 64, lambda value: f'{value:016x}'),
+    # unique local address prefix, fd00::/8 with a random global ID and subnet 0
+    MeshcopTlvType.MESHLOCALPREFIX: (1 << 40, lambda value: f'fd{value:010x}0000'),
+}
+
+
+def mask_to_channels(channel_mask: bytes) -> List[int]:
+    # the most significant bit of the first byte is channel 0
+    return [i for i in range(len(channel_mask) * 8)
+            if channel_mask[i // 8] & (0x80 >> (i % 8))]
+
+
+class SiteIndex:
+    def __init__(self):
+        self.used: Dict[MeshcopTlvType, Set[str]] = {
+            type: set() for type in PLANNED_FIELDS
+        }
+        self.channel_use: Counter = Counter()
+
+
+# Allocates network parameters not colliding with any other network of the same site.
+# Sites are assumed to be far enough apart to reuse the same values.
+class NetworkPlanner:
+    def __init__(self, seed=None, max_attempts: int = 64):
+        self.max_attempts = max_attempts
+        self._random = random.Random(seed)
+        self._sites: Dict[str, SiteIndex] = {}
+
+    def _site(self, site: str) -> SiteIndex:
+        return self._sites.setdefault(site, SiteIndex())
+
+    def _random_hex(self, length: int) -> str:
+        return self._random.getrandbits(length * 8).to_bytes(length, 'big').hex()
+
+    def add_existing(self, dataset: ThreadDataset, site: str = ''):
+        index = self._site(site)
+        for type in PLANNED_FIELDS:
+            if type in dataset.entries:
+                index.used[type].add(dataset.get_entry(type).data.lower())
+        if MeshcopTlvType.CHANNEL in dataset.entries:
+            index.channel_use[dataset.get_entry(MeshcopTlvType.CHANNEL).channel] += 1
+
+    def allocate(self, type: MeshcopTlvType, site: str = '') -> str:
+        used = self._site(site).used[type]
+        space, to_hex = FIELD_SPACES[type]
+        for _ in range(self.max_attempts):
+            value = to_hex(self._random.randrange(space))
+            if value not in used:
+                used.add(value)
+                return value
+
+        # the space is nearly full, look for a free value from a random start
+        start = self._random.randrange(space)
+        for i in range(min(space, len(used) + 1)):
+            value = to_hex((start + i) % space)
+            if value not in used:
+                used.add(value)
+                return value
+        raise ValueError(f'No free {type.name} value left for site "{site}"')
+
+    def allocate_channel(self, channels: List[int], site: str = '') -> int:
+        if not channels:
+            raise ValueError('No channel allowed by the channel mask')
+        channel_use = self._site(site).channel_use
+        channel = min(channels, key=lambda c: channel_use[c])
+        channel_use[channel] += 1
+        return channel
+
+    def plan(self, template: ThreadDataset, site: str = '') -> ThreadDataset:
+        ds = ThreadDataset(template.to_bytes())
+        for type in PLANNED_FIELDS:
+            ds.set_entry(type, [self.allocate(type, site)])
+        ds.set_entry(MeshcopTlvType.NETWORKKEY, [self._random_hex(16)])
+
+        channels = DEFAULT_CHANNELS
+        if MeshcopTlvType.CHANNELMASK in ds.entries:
+            channels = [channel
+                        for entry in ds.get_entry(MeshcopTlvType.CHANNELMASK).entries
+                        if entry.channel_page == 0
+                        for channel in mask_to_channels(entry.channel_mask)]
+        ds.set_entry(MeshcopTlvType.CHANNEL, [str(self.allocate_channel(channels, site))])
+        return ds
+
+
+def load_existing(planner: NetworkPlanner, file_path: str):
+    with open(file_path) as file:
+        for line_no, line in enumerate(file, 1):
+            parts = line.split()
+            if not parts:
+                continue
+            # lines hold either "<hex>" or "<site> <hex>"
+            site, data = (parts[0], parts[1]) if len(parts) > 1 else ('', parts[0])
+            try:
+                planner.add_existing(ThreadDataset(bytes.fromhex(data)), site)
+            except Exception as e:
+                raise ValueError(f'{file_path}:{line_no}: {e}')
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='bbtc.py network-planner',
+        description='Plan datasets of new networks with PAN ID, extended PAN ID and '
+        'mesh local prefix not colliding with other networks of the same site, '
+        'and channels spread over the channel mask.')
+    parser.add_argument('--count', type=int, required=True,
+                        help='Number of networks to plan')
+    parser.add_argument('--site', default='',
+                        help='Site of the new networks')
+    parser.add_argument('--existing', action='append', default=[], metavar='FILE',
+                        help='File with datasets already in use, one per line, '
+                        'as "<hex>" or "<site> <hex>". May be repeated.')
+    parser.add_argument('--template',
+                        help='Hex encoded dataset used for all other fields. '
+                        'The initial dataset is used if not given.')
+    parser.add_argument('--seed', type=int, help='Seed of the random generator')
+    args = parser.parse_args(argv)
+
+    planner = NetworkPlanner(seed=args.seed)
+    template = ThreadDataset(bytes.fromhex(args.template)) if args.template \
+        else ThreadDataset()
+    try:
+        for file_path in args.existing:
+            load_existing(planner, file_path)
+        for _ in range(args.count):
+            sys.stdout.write(planner.plan(template, args.site).to_bytes().hex() + '\n')
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
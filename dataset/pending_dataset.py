@@ -0,0 +1,63 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import secrets
+import time
+from typing import List, Optional
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_entries import create_dataset_entry
+from dataset.dataset_validation import ACTIVE_DATASET_FIELDS, check_dataset
+from tlv.dataset_tlv import MeshcopTlvType
+
+PENDING_DATASET_FIELDS = ACTIVE_DATASET_FIELDS + [
+    MeshcopTlvType.PENDINGTIMESTAMP,
+    MeshcopTlvType.DELAYTIMER,
+]
+
+
+def put_entry(dataset: ThreadDataset, type: MeshcopTlvType, args: List[str]):
+    if type in dataset.entries:
+        dataset.set_entry(type, args)
+    else:
+        dataset.entries[type] = create_dataset_entry(type, args)
+
+
+# The pending dataset carries the active dataset the devices switch to once its
+# delay timer expires. Both timestamps have to be newer than the ones the network
+# has seen, the delay timer is set for each device when it is sent.
+def build_pending_dataset(active: ThreadDataset, network_key: Optional[str] = None,
+                          now: Optional[float] = None) -> ThreadDataset:
+    now = int(time.time() if now is None else now)
+    pending = ThreadDataset(active.to_bytes())
+    active_seconds = 0
+    if MeshcopTlvType.ACTIVETIMESTAMP in pending.entries:
+        active_seconds = pending.get_entry(MeshcopTlvType.ACTIVETIMESTAMP).seconds
+    put_entry(pending, MeshcopTlvType.ACTIVETIMESTAMP,
+              [str(max(now, active_seconds + 1))])
+    put_entry(pending, MeshcopTlvType.PENDINGTIMESTAMP, [str(now)])
+    put_entry(pending, MeshcopTlvType.NETWORKKEY, [network_key or secrets.token_hex(16)])
+    put_entry(pending, MeshcopTlvType.DELAYTIMER, ['0'])
+    check_dataset(pending, PENDING_DATASET_FIELDS)
+    return pending
+
+
+# active dataset in effect after the switch, for devices which missed it
+def pending_to_active(pending: ThreadDataset) -> ThreadDataset:
+    active = ThreadDataset(pending.to_bytes())
+    del active.entries[MeshcopTlvType.PENDINGTIMESTAMP]
+    del active.entries[MeshcopTlvType.DELAYTIMER]
+    return active
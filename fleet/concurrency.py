@@ -0,0 +1,91 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Additive increase, multiplicative decrease of the number of sessions in flight.
+# The window grows by one for every window's worth of sessions that connected
+# without failing and without their connect latency rising much over the lowest
+# one seen, and is cut by decrease_factor on a failure, once per congestion event.
+class AimdLimiter:
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 3.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = float(min(max(initial, minimum), maximum))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.peak_window = self.window
+        self.decreases = 0
+        self.min_latency: Optional[float] = None
+        self._started = 0
+        self._last_decrease = 0
+        self._condition = None
+
+    def __str__(self):
+        latency = f'{self.min_latency:.2f} s' if self.min_latency is not None else '-'
+        return f'adaptive concurrency: window {self.limit} ' \
+            f'(peak {int(self.peak_window)}), {self.decreases} decrease(s), ' \
+            f'lowest connect latency {latency}'
+
+    @property
+    def limit(self) -> int:
+        return max(int(self.window), self.minimum)
+
+    async def acquire(self) -> int:
+        # returns a ticket identifying when the session was started
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self._started += 1
+            return self._started
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self, ticket: int, latency: float):
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if latency > self.min_latency * self.latency_tolerance:
+            logger.info('Connect latency %.2f s is too high', latency)
+            self._decrease(ticket)
+            return
+        self.window = min(self.window + 1 / self.window, float(self.maximum))
+        self.peak_window = max(self.peak_window, self.window)
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def on_failure(self, ticket: int):
+        self._decrease(ticket)
+
+    def _decrease(self, ticket: int):
+        # sessions started before the last decrease saw the same congestion
+        if ticket <= self._last_decrease:
+            return
+        self.window = max(self.window * self.decrease_factor, float(self.minimum))
+        self._last_decrease = self._started
+        self.decreases += 1
+        logger.info('Concurrency window decreased to %d', self.limit)
@@ -0,0 +1,246 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Callable, Iterable, List, Optional, TYPE_CHECKING
+
+from ble.ble_session import open_secure_session, close_secure_session
+from ble.link_shaper import LinkProfile
+from ble.ble_stream_secure import BleStreamSecure, HandshakeStats
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+from utils.retry import RetryPolicy
+
+if TYPE_CHECKING:
+    from fleet.concurrency import AimdLimiter
+    from fleet.journal import CommissioningJournal
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceResult:
+    def __init__(self, address: str):
+        self.address = address
+        self.status: Optional[int] = None
+        self.payload: bytes = b''
+        self.error: Optional[str] = None
+        # collected from the session by FleetOperation.inspect()
+        self.details: Optional[dict] = None
+        self.skipped = False
+        self.handshake: Optional[HandshakeStats] = None
+        # concurrency window when the device was started, if adaptive
+        self.window: Optional[int] = None
+        self.started = time.time()
+        self.finished: Optional[float] = None
+
+    def __str__(self):
+        if self.skipped:
+            return f'{self.address}: skipped, already done'
+        if self.error is not None:
+            return f'{self.address}: error: {self.error}'
+        if self.status != 0:
+            return f'{self.address}: failed with status {self.status}'
+        return f'{self.address}: OK'
+
+    def to_record(self) -> dict:
+        return {
+            'address': self.address,
+            'status': self.status,
+            'error': self.error,
+            'skipped': self.skipped,
+            'payload': self.payload.hex(),
+            'details': self.details,
+            'started': self.started,
+            'finished': self.finished,
+            'window': self.window,
+        }
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.status == 0
+
+    def set_response(self, tlv: TLV):
+        self.payload = tlv.value
+        if tlv.type == TcatTLVType.RESPONSE_W_STATUS.value:
+            self.status = tlv.value[0] if tlv.value else None
+        elif tlv.type == TcatTLVType.RESPONSE_W_PAYLOAD.value:
+            self.status = 0
+        else:
+            # anything else is not an answer to the request, it is never journaled
+            self.error = f'Unexpected response of type 0x{tlv.type:02x}'
+
+
+# covers connecting to the device as well, a stuck device gives its slot back after it
+OPERATION_POLICY = RetryPolicy(timeout=60.0)
+
+
+class FleetOperation(ABC):
+    # every attempt runs in a new session
+    retry_policy = OPERATION_POLICY
+
+    @abstractmethod
+    def get_name(self) -> str:
+        pass
+
+    def get_target(self) -> Optional[str]:
+        # operations with a target are journaled and skipped once done
+        return None
+
+    def inspect(self, ble_sstream: BleStreamSecure) -> Optional[dict]:
+        # details of the device known once the session is open, kept in its result
+        return None
+
+    async def execute_on(self, address: str,
+                         ble_sstream: BleStreamSecure) -> Optional[TLV]:
+        # run on every device, operations doing the same on every device implement
+        # execute() instead. None when the operation sends no request.
+        return await self.execute(ble_sstream)
+
+    async def execute(self, ble_sstream: BleStreamSecure) -> Optional[TLV]:
+        raise NotImplementedError(f'{type(self).__name__} implements neither execute() '
+                                  'nor execute_on()')
+
+    def close(self):
+        # the run ended, called in every process the operation ran in
+        pass
+
+
+async def send_request(ble_sstream: BleStreamSecure, request: TLV) -> TLV:
+    response = await ble_sstream.send_with_resp(request.to_bytes())
+    if not response:
+        raise TimeoutError('No response from the device')
+    return TLV.from_bytes(response)
+
+
+class FleetRunner:
+    def __init__(self, operation: FleetOperation, concurrency: int = 4,
+                 journal: Optional[CommissioningJournal] = None, adapter: str = None,
+                 crypto_executor: Optional[Executor] = None,
+                 tls_profile: str = 'default', limiter: Optional[AimdLimiter] = None,
+                 link_profile: Optional[LinkProfile] = None, connect=open_secure_session):
+        self.operation = operation
+        self.concurrency = concurrency
+        self.journal = journal
+        self.adapter = adapter
+        self.crypto_executor = crypto_executor
+        self.tls_profile = tls_profile
+        self.limiter = limiter
+        self.link_profile = link_profile
+        self._connect = connect
+
+    async def run(self, addresses: Iterable[str],
+                  on_result: Callable[[DeviceResult], None] = None) -> List[DeviceResult]:
+        name = self.operation.get_name()
+        target = self.operation.get_target()
+        journaled = self.journal is not None and target is not None
+        done = self.journal.completed(name, target) if journaled else set()
+
+        results: List[DeviceResult] = []
+
+        def report(result: DeviceResult):
+            if journaled and not result.skipped:
+                self.journal.record(name, target, result)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        pending = []
+        for address in addresses:
+            if address in done:
+                result = DeviceResult(address)
+                result.skipped = True
+                report(result)
+            else:
+                pending.append(address)
+
+        try:
+            await self.run_pending(pending, report)
+        finally:
+            self.operation.close()
+        if self.journal is not None:
+            self.journal.flush()
+        return results
+
+    async def run_pending(self, addresses: List[str],
+                          report: Callable[[DeviceResult], None]):
+        # workers share one iterator, so every device is taken exactly once
+        queue = iter(addresses)
+
+        async def worker():
+            for address in queue:
+                report(await self.run_device(address))
+
+        # with a limiter, the workers beyond its window wait for a free slot
+        workers = self.limiter.maximum if self.limiter else self.concurrency
+        await asyncio.gather(*(worker() for _ in range(max(workers, 1))))
+
+    async def run_device(self, address: str) -> DeviceResult:
+        if self.limiter is None:
+            return await self.run_session(DeviceResult(address))
+
+        ticket = await self.limiter.acquire()
+        result = DeviceResult(address)
+        result.window = self.limiter.limit
+        try:
+            return await self.run_session(result, ticket)
+        finally:
+            await self.limiter.release()
+
+    async def connect(self, address: str, ticket: int = None) -> BleStreamSecure:
+        # connect and handshake are where an overloaded controller shows first
+        start_time = time.monotonic()
+        try:
+            ble_sstream = await self._connect(
+                address, adapter=self.adapter, crypto_executor=self.crypto_executor,
+                tls_profile=self.tls_profile, link_profile=self.link_profile)
+        except BaseException:
+            # including attempts cancelled at their deadline
+            if ticket is not None:
+                await self.limiter.on_failure(ticket)
+            raise
+        if ticket is not None:
+            await self.limiter.on_success(ticket, time.monotonic() - start_time)
+        return ble_sstream
+
+    async def run_session(self, result: DeviceResult, ticket: int = None) -> DeviceResult:
+        try:
+            response = await self.operation.retry_policy.run(
+                lambda: self.run_attempt(result, ticket),
+                f'{self.operation.get_name()} on {result.address}')
+            if response is None:
+                result.status = 0
+            else:
+                result.set_response(response)
+        except Exception as e:
+            logger.debug('%s failed', result.address, exc_info=True)
+            result.error = str(e) or type(e).__name__
+        result.finished = time.time()
+        return result
+
+    async def run_attempt(self, result: DeviceResult,
+                          ticket: int = None) -> Optional[TLV]:
+        ble_sstream = await self.connect(result.address, ticket)
+        result.handshake = ble_sstream.handshake_stats
+        try:
+            result.details = self.operation.inspect(ble_sstream)
+            return await self.operation.execute_on(result.address, ble_sstream)
+        finally:
+            await close_secure_session(ble_sstream)
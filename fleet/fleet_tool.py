@@ -0,0 +1,341 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from ble.ble_stream_secure import TLS_PROFILES
+from ble.link_shaper import LINK_PROFILES, link_profile_arg
+from dataset.dataset import ThreadDataset
+from dataset.dataset_bank import DatasetBank
+from dataset.dataset_validation import check_dataset
+from dataset.pending_dataset import build_pending_dataset, pending_to_active
+from fleet.concurrency import AimdLimiter
+from fleet.fleet_runner import DeviceResult, FleetOperation, FleetRunner
+from fleet.inventory import InventoryOperation, InventoryWriter
+from fleet.journal import CommissioningJournal
+from fleet.key_rotation import KeyRotationOperation, estimate_switch_delay
+from fleet.scheduling import scan_signal_map
+from fleet.operations import (BankCommissionOperation, CommissionOperation,
+                              DecommissionOperation)
+from fleet.sharding import ShardedRunner
+from utils.loop_monitor import LoopLagMonitor
+from utils.retry import RetryPolicy
+from utils.ndjson import NdjsonWriter, OUTPUT_FORMATS as RESULT_FORMATS, stdout_records
+
+
+def read_addresses(file_path: str) -> List[str]:
+    addresses = []
+    with open(file_path) as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                addresses.append(line)
+    return addresses
+
+
+def print_summary(results: List[DeviceResult]) -> int:
+    skipped = sum(result.skipped for result in results)
+    failed = sum(not (result.skipped or result.success) for result in results)
+    print(f'{len(results)} device(s): {len(results) - skipped - failed} succeeded, '
+          f'{failed} failed, {skipped} skipped.')
+    return 1 if failed else 0
+
+
+def print_handshake_summary(results: List[DeviceResult]):
+    handshakes = [result.handshake for result in results if result.handshake]
+    if not handshakes:
+        return
+    count = len(handshakes)
+    print('TLS handshake per device: '
+          f'{sum(h.flights_sent for h in handshakes) / count:.1f} flight(s) / '
+          f'{sum(h.bytes_sent for h in handshakes) / count:.0f} B sent, '
+          f'{sum(h.flights_received for h in handshakes) / count:.1f} flight(s) / '
+          f'{sum(h.bytes_received for h in handshakes) / count:.0f} B received, '
+          f'{sum(h.duration for h in handshakes) / count:.2f} s')
+
+
+async def run_operation(args, operation: FleetOperation,
+                        records: Optional[NdjsonWriter] = None,
+                        on_result: Callable[[DeviceResult], None] = None) -> int:
+    operation.retry_policy = RetryPolicy(timeout=args.device_timeout,
+                                         attempts=args.attempts)
+
+    def report(result: DeviceResult):
+        if records is None:
+            print(result)
+        else:
+            records.write(result.to_record())
+        if on_result is not None:
+            on_result(result)
+
+    journal = CommissioningJournal(args.journal) if args.journal else None
+    crypto_executor = None
+    if args.crypto_threads and not args.adapters:
+        crypto_executor = ThreadPoolExecutor(args.crypto_threads)
+    addresses = read_addresses(args.devices)
+    adapters = args.adapters.split(',') if args.adapters else None
+    signal_map = None
+    if args.scan:
+        signal_map = await scan_signal_map(adapters or [None], args.scan)
+        addresses = signal_map.order(addresses)
+        heard = sum(signal_map.best(address) is not None for address in addresses)
+        weak = sum(signal_map.is_weak(address) for address in addresses)
+        print(f'{heard} of {len(addresses)} device(s) heard, {weak} weak or not heard '
+              'will be handled last.')
+
+    start_time = time.monotonic()
+    try:
+        if adapters:
+            runner = ShardedRunner(operation, adapters,
+                                   concurrency=args.concurrency, journal=journal,
+                                   crypto_threads=args.crypto_threads,
+                                   tls_profile=args.tls_profile, adaptive=args.adaptive,
+                                   signal_map=signal_map, link_profile=args.link_profile)
+        else:
+            limiter = AimdLimiter(maximum=args.concurrency) if args.adaptive else None
+            runner = FleetRunner(operation, concurrency=args.concurrency,
+                                 journal=journal, crypto_executor=crypto_executor,
+                                 tls_profile=args.tls_profile, limiter=limiter,
+                                 link_profile=args.link_profile)
+        async with LoopLagMonitor(slow_callback_duration=args.slow_callback) \
+                as lag_monitor:
+            results = await runner.run(addresses, on_result=report)
+    finally:
+        if journal is not None:
+            journal.close()
+        if crypto_executor is not None:
+            crypto_executor.shutdown()
+
+    if args.adapters:
+        for metrics in runner.metrics.values():
+            print(metrics)
+    else:
+        print(lag_monitor)
+        for slow_callback in lag_monitor.slowest(5):
+            print(slow_callback)
+        if runner.limiter is not None:
+            print(runner.limiter)
+    print_handshake_summary(results)
+    elapsed = time.monotonic() - start_time
+    processed = sum(not result.skipped for result in results)
+    print(f'{processed} device(s) in {elapsed:.1f} s, '
+          f'{60 * processed / elapsed:.1f} devices/minute.')
+    return print_summary(results)
+
+
+async def commission(args, records: Optional[NdjsonWriter]) -> int:
+    if args.bank:
+        return await commission_from_bank(args, records)
+    try:
+        dataset = ThreadDataset(bytes.fromhex(args.dataset)) if args.dataset \
+            else ThreadDataset()
+        check_dataset(dataset)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    operation = CommissionOperation(dataset.to_bytes(), start=args.start)
+    return await run_operation(args, operation, records)
+
+
+async def commission_from_bank(args, records: Optional[NdjsonWriter]) -> int:
+    try:
+        # every dataset is read for validation, the tables are checked as well
+        with DatasetBank(args.bank, verify=True) as bank:
+            for _, data in bank.datasets():
+                try:
+                    check_dataset(ThreadDataset(data))
+                finally:
+                    data.release()
+            missing = [address for address in read_addresses(args.devices)
+                       if address not in bank]
+        operation = BankCommissionOperation(args.bank, start=args.start)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    if missing:
+        print(f'{len(missing)} device(s) not in the dataset bank, '
+              f'for example {missing[0]}.', file=sys.stderr)
+        return 1
+    return await run_operation(args, operation, records)
+
+
+async def decommission(args, records: Optional[NdjsonWriter]) -> int:
+    run_id = args.run_id
+    if run_id is None:
+        # every invocation is a new run, a device returned twice a day is handled twice
+        run_id = time.strftime('%Y%m%dT%H%M%S')
+        if args.journal:
+            print(f'Run id {run_id}, pass it with --run-id to resume this run.',
+                  file=sys.stderr)
+    return await run_operation(args, DecommissionOperation(run_id), records)
+
+
+async def inventory(args, records: Optional[NdjsonWriter]) -> int:
+    with open(args.output, 'w', newline='') as file:
+        writer = InventoryWriter(file)
+        return await run_operation(args, InventoryOperation(), records, writer.write)
+
+
+async def rotate_key(args, records: Optional[NdjsonWriter]) -> int:
+    try:
+        active = ThreadDataset(bytes.fromhex(args.dataset))
+        check_dataset(active)
+        pending = build_pending_dataset(active, args.network_key)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    delay = args.delay
+    if delay is None:
+        adapters = len(args.adapters.split(',')) if args.adapters else 1
+        delay = estimate_switch_delay(len(read_addresses(args.devices)),
+                                      args.concurrency * adapters)
+    switch_time = time.time() + delay
+    print(f'Pending dataset: {pending.to_bytes().hex()}')
+    print(f'Switching to the new network key in {delay:.0f} s, at '
+          f'{time.strftime("%H:%M:%S", time.localtime(switch_time))}.')
+
+    stragglers: List[DeviceResult] = []
+
+    def on_result(result: DeviceResult):
+        if not (result.success or result.skipped):
+            stragglers.append(result)
+
+    operation = KeyRotationOperation(pending, switch_time, args.pending_dataset_tlv)
+    res = await run_operation(args, operation, records, on_result)
+    if stragglers:
+        print(f'{len(stragglers)} straggler(s) keep the old network key and have to '
+              'be commissioned with the new active dataset:')
+        for result in stragglers:
+            print(f'  {result}')
+        print(f'New active dataset: {pending_to_active(pending).to_bytes().hex()}')
+    return res
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--devices', required=True,
+                        help='File with one device address per line')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Number of devices handled at the same time '
+                        '(per adapter when --adapters is given)')
+    parser.add_argument('--adapters',
+                        help='Comma separated Bluetooth adapters, e.g. hci0,hci1. '
+                        'Each adapter is driven by a separate process.')
+    parser.add_argument('--journal',
+                        help='SQLite journal file. Devices already done according '
+                        'to the journal are skipped.')
+    parser.add_argument('--crypto-threads', type=int, default=0,
+                        help='Number of threads doing the TLS handshake crypto '
+                        '(per adapter when --adapters is given). By default it is '
+                        'done on the event loop.')
+    parser.add_argument('--device-timeout', type=float, default=60.0,
+                        metavar='SECONDS',
+                        help='Deadline of every attempt on a device, including '
+                        'connecting to it')
+    parser.add_argument('--attempts', type=int, default=1,
+                        help='Number of attempts on a device, each in a new session, '
+                        'with a jittered backoff between them')
+    parser.add_argument('--results', choices=RESULT_FORMATS, default='text',
+                        help='Format of the device results, "ndjson" writes one '
+                        'JSON record per device to stdout and the summary to stderr')
+    parser.add_argument('--scan', type=float, metavar='SECONDS',
+                        help='Scan for the devices first and handle them in the '
+                        'order of their signal strength, each on the adapter '
+                        'hearing it best')
+    parser.add_argument('--link-profile', type=link_profile_arg, metavar='PROFILE',
+                        help='Shape the links to reproduce bad radio conditions: '
+                        f'one of {", ".join(LINK_PROFILES)} and/or FIELD=VALUE pairs, '
+                        'e.g. "weak,seed=2"')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Adapt the number of devices handled at the same time '
+                        'to connect failures and latency, up to --concurrency')
+    parser.add_argument('--slow-callback', type=float, metavar='SECONDS',
+                        help='Record code blocking the event loop for longer than '
+                        'SECONDS and print the slowest ones with the stack of their '
+                        'coroutine (without --adapters)')
+    parser.add_argument('--tls-profile', choices=TLS_PROFILES, default='default',
+                        help='TLS settings, "lean" restricts the handshake to '
+                        'TLS 1.3 with P-256 to save link round trips')
+
+
+def main(argv: List[str] = None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(prog='bbtc.py fleet',
+                                     description='Run a command on many devices.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    commission_parser = subparsers.add_parser(
+        'commission', help='Commission the devices with a dataset.')
+    add_common_arguments(commission_parser)
+    dataset_group = commission_parser.add_mutually_exclusive_group()
+    dataset_group.add_argument('--dataset',
+                               help='Hex encoded dataset. '
+                               'The initial dataset is used if not given.')
+    dataset_group.add_argument('--bank', metavar='FILE',
+                               help='Dataset bank with a dataset for every device, '
+                               'built with "bbtc.py dataset-bank"')
+    commission_parser.add_argument('--start', action='store_true',
+                                   help='Also enable the Thread interface, '
+                                   'in the same request')
+    commission_parser.set_defaults(handler=commission)
+
+    decommission_parser = subparsers.add_parser(
+        'decommission', help='Decommission the devices, removing their Thread network '
+        'credentials.')
+    add_common_arguments(decommission_parser)
+    decommission_parser.add_argument('--run-id',
+                                     help='Name of the run in the journal, devices '
+                                     'decommissioned in an earlier run are not '
+                                     'skipped. Pass the id of an interrupted run to '
+                                     'resume it (default: a new id from the current '
+                                     'time)')
+    decommission_parser.set_defaults(handler=decommission)
+
+    inventory_parser = subparsers.add_parser(
+        'inventory', help='Collect the certificate identity of the devices.')
+    add_common_arguments(inventory_parser)
+    inventory_parser.add_argument('--output', required=True,
+                                  help='CSV file the records are written to, one '
+                                  'row per device')
+    inventory_parser.set_defaults(handler=inventory)
+
+    rotate_key_parser = subparsers.add_parser(
+        'rotate-key', help='Switch all devices of a network to a new network key '
+        'at the same time.')
+    add_common_arguments(rotate_key_parser)
+    rotate_key_parser.add_argument('--dataset', required=True,
+                                   help='Hex encoded active dataset of the network')
+    rotate_key_parser.add_argument('--network-key',
+                                   help='New network key in hex, random if not given')
+    rotate_key_parser.add_argument('--delay', type=float, metavar='SECONDS',
+                                   help='Time until the switch, estimated from the '
+                                   'number of devices and --concurrency if not given')
+    rotate_key_parser.add_argument('--pending-dataset-tlv', required=True, metavar='TYPE',
+                                   type=lambda value: int(value, 0),
+                                   help='TCAT TLV type the devices accept a pending '
+                                   'dataset with, e.g. 0x21')
+    rotate_key_parser.set_defaults(handler=rotate_key)
+
+    args = parser.parse_args(argv)
+    with stdout_records(args.results) as records:
+        return asyncio.run(args.handler(args, records))
@@ -0,0 +1,77 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import csv
+from typing import Dict, Optional, TextIO
+
+from ble.ble_stream_secure import BleStreamSecure
+from fleet.fleet_runner import DeviceResult, FleetOperation
+
+# subject attributes of the device certificate, with their column names
+SUBJECT_FIELDS = {
+    'commonName': 'common_name',
+    'organizationName': 'organization',
+    'serialNumber': 'serial_number',
+}
+INVENTORY_COLUMNS = ['address', 'status', 'error'] + list(SUBJECT_FIELDS.values()) + \
+    ['certificate_serial', 'not_after']
+
+
+# Collects the identity every device presents in its TCAT certificate. The
+# certificate is verified during the handshake, so no request is sent at all.
+class InventoryOperation(FleetOperation):
+    def get_name(self) -> str:
+        return 'inventory'
+
+    def inspect(self, ble_sstream: BleStreamSecure) -> Optional[dict]:
+        return certificate_details(ble_sstream.ssl_object.getpeercert() or {})
+
+    async def execute(self, ble_sstream: BleStreamSecure) -> None:
+        return None
+
+
+def certificate_details(cert: dict) -> Dict[str, Optional[str]]:
+    res = dict.fromkeys(SUBJECT_FIELDS.values())
+    for rdn in cert.get('subject', ()):
+        for key, value in rdn:
+            if key in SUBJECT_FIELDS:
+                res[SUBJECT_FIELDS[key]] = value
+    res['certificate_serial'] = cert.get('serialNumber')
+    res['not_after'] = cert.get('notAfter')
+    return res
+
+
+def inventory_record(result: DeviceResult) -> Dict[str, Optional[str]]:
+    record = dict.fromkeys(INVENTORY_COLUMNS)
+    record.update(result.details or {})
+    record['address'] = result.address
+    record['status'] = result.status
+    record['error'] = result.error
+    return record
+
+
+# Writes a CSV row for every device as soon as its result is known, so that an
+# interrupted sweep keeps everything collected until then. NDJSON records come
+# from the common --results option.
+class InventoryWriter:
+    def __init__(self, file: TextIO):
+        self.file = file
+        self._csv = csv.DictWriter(file, fieldnames=INVENTORY_COLUMNS)
+        self._csv.writeheader()
+
+    def write(self, result: DeviceResult):
+        self._csv.writerow(inventory_record(result))
+        self.file.flush()
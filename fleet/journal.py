@@ -0,0 +1,82 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import annotations
+import sqlite3
+import time
+from typing import Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from fleet.fleet_runner import DeviceResult
+
+
+class CommissioningJournal:
+    def __init__(self, db_path: str, batch_size: int = 100, flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._connection = sqlite3.connect(db_path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # WAL keeps the database consistent on a crash, losing at most the last batch
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS journal ('
+            ' address TEXT NOT NULL,'
+            ' operation TEXT NOT NULL,'
+            ' target TEXT,'
+            ' status INTEGER,'
+            ' error TEXT,'
+            ' started REAL,'
+            ' finished REAL,'
+            ' PRIMARY KEY (address, operation))'
+        )
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def completed(self, operation: str, target: str) -> Set[str]:
+        self.flush()
+        rows = self._connection.execute(
+            'SELECT address FROM journal'
+            ' WHERE operation = ? AND target = ? AND status = 0 AND error IS NULL',
+            (operation, target))
+        return {address for (address,) in rows}
+
+    def record(self, operation: str, target: str, result: DeviceResult):
+        self._pending.append((result.address, operation, target, result.status,
+                              result.error, result.started, result.finished))
+        if len(self._pending) >= self.batch_size \
+                or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO journal VALUES (?, ?, ?, ?, ?, ?, ?)',
+                self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
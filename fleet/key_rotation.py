@@ -0,0 +1,73 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import hashlib
+import math
+import time
+
+from ble.ble_stream_secure import BleStreamSecure
+from dataset.dataset import ThreadDataset
+from dataset.dataset_entries import create_dataset_entry
+from fleet.fleet_runner import FleetOperation, send_request
+from tlv.tlv import TLV
+from tlv.dataset_tlv import MeshcopTlvType
+
+# devices reached with less time left than this are not sent the dataset, they would
+# not reliably store it before the switch
+MIN_REMAINING_DELAY = 5.0
+# time left after the last device is expected to be done
+SWITCH_MARGIN = 30.0
+# generous estimate of connecting to, and sending the dataset to one device
+DEVICE_TIME_ESTIMATE = 10.0
+
+
+def estimate_switch_delay(devices: int, slots: int) -> float:
+    rounds = math.ceil(devices / max(slots, 1))
+    return rounds * DEVICE_TIME_ESTIMATE + SWITCH_MARGIN
+
+
+# Sends the same pending dataset to every device, with the delay timer computed
+# right before sending, so that devices reached later get a shorter delay and the
+# whole network switches to the new network key at switch_time.
+# switch_time is wall clock time, as it is shared with the adapter processes.
+# No TCAT TLV for pending datasets is defined in this tree, the type the devices
+# accept it with has to be given as tlv_type.
+class KeyRotationOperation(FleetOperation):
+    def __init__(self, pending: ThreadDataset, switch_time: float, tlv_type: int):
+        self.switch_time = switch_time
+        self.tlv_type = tlv_type
+        # everything but the delay timer is encoded once
+        self._dataset = b''.join(entry.to_tlv().to_bytes()
+                                 for type, entry in pending.entries.items()
+                                 if type != MeshcopTlvType.DELAYTIMER)
+        self._target = hashlib.sha256(self._dataset).hexdigest()
+
+    def get_name(self) -> str:
+        return 'rotate-key'
+
+    def get_target(self) -> str:
+        return self._target
+
+    def build_request(self, now: float) -> TLV:
+        remaining = self.switch_time - now
+        if remaining < MIN_REMAINING_DELAY:
+            raise TimeoutError(f'too late for the switch, {remaining:.1f} s left')
+        delay_timer = create_dataset_entry(MeshcopTlvType.DELAYTIMER,
+                                           [str(int(remaining * 1000))])
+        return TLV(self.tlv_type, self._dataset + delay_timer.to_tlv().to_bytes())
+
+    async def execute(self, ble_sstream: BleStreamSecure) -> TLV:
+        return await send_request(ble_sstream, self.build_request(time.time()))
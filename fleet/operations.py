@@ -0,0 +1,118 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import hashlib
+
+from ble.ble_session import send_tlv_requests
+from ble.ble_stream_secure import BleStreamSecure
+from dataset.dataset_bank import DatasetBank
+from fleet.fleet_runner import FleetOperation, send_request
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+
+
+async def send_dataset(ble_sstream: BleStreamSecure, dataset: bytes,
+                       start: bool = False) -> TLV:
+    request = TLV(TcatTLVType.ACTIVE_DATASET.value, dataset)
+    if not start:
+        return await send_request(ble_sstream, request)
+
+    requests = [request, TLV(TcatTLVType.THREAD_START.value, bytes())]
+    responses = await send_tlv_requests(ble_sstream, requests)
+    if len(responses) < len(requests):
+        raise TimeoutError(f'Got {len(responses)} of {len(requests)} responses')
+    # report the first failed step, if any
+    for response in responses:
+        if response.type == TcatTLVType.RESPONSE_W_STATUS.value \
+                and response.value[:1] != b'\x00':
+            return response
+    return responses[-1]
+
+
+class CommissionOperation(FleetOperation):
+    def __init__(self, dataset: bytes, start: bool = False):
+        self.dataset = dataset
+        self.start = start
+        self._target = hashlib.sha256(dataset).hexdigest()
+        if start:
+            self._target += ':start'
+
+    def get_name(self) -> str:
+        return 'commission'
+
+    def get_target(self) -> str:
+        return self._target
+
+    async def execute(self, ble_sstream: BleStreamSecure) -> TLV:
+        return await send_dataset(ble_sstream, self.dataset, self.start)
+
+
+# Devices are returned and decommissioned again over time, a journal skips only the
+# devices already done in the same run.
+class DecommissionOperation(FleetOperation):
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+
+    def get_name(self) -> str:
+        return 'decommission'
+
+    def get_target(self) -> str:
+        return self.run_id
+
+    async def execute(self, ble_sstream: BleStreamSecure) -> TLV:
+        request = TLV(TcatTLVType.DECOMMISSION.value, bytes())
+        return await send_request(ble_sstream, request)
+
+
+# Commissions every device with its own dataset, looked up in a dataset bank. The
+# bank is opened in every process using the operation, on first use, and closed when
+# the run ends.
+class BankCommissionOperation(FleetOperation):
+    def __init__(self, bank_path: str, start: bool = False):
+        self.bank_path = bank_path
+        self.start = start
+        self._bank = None
+        with DatasetBank(bank_path) as bank:
+            self._target = bank.digest.hex()
+        if start:
+            self._target += ':start'
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_bank'] = None
+        return state
+
+    def get_name(self) -> str:
+        return 'commission'
+
+    def get_target(self) -> str:
+        return self._target
+
+    async def execute_on(self, address: str, ble_sstream: BleStreamSecure) -> TLV:
+        if self._bank is None:
+            self._bank = DatasetBank(self.bank_path)
+        dataset = self._bank.lookup(address)
+        if dataset is None:
+            raise LookupError(f'{address} is not in the dataset bank')
+        try:
+            return await send_dataset(ble_sstream, dataset, self.start)
+        finally:
+            dataset.release()
+
+    def close(self):
+        if self._bank is not None:
+            self._bank.close()
+            self._bank = None
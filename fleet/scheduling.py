@@ -0,0 +1,69 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from ble.ble_scanner import Advertisement, scan_tcat_advertisements
+
+# devices heard below this level run at a fraction of the usual throughput
+WEAK_RSSI = -85
+
+
+# Signal strength of every device, as heard by every adapter.
+class SignalMap:
+    def __init__(self):
+        self.rssi: Dict[str, Dict[Optional[str], int]] = {}
+
+    def add(self, advertisement: Advertisement):
+        self.rssi.setdefault(advertisement.address.upper(), {})[
+            advertisement.adapter] = advertisement.rssi
+
+    def get(self, address: str, adapter: str = None) -> Optional[int]:
+        return self.rssi.get(address.upper(), {}).get(adapter)
+
+    def best(self, address: str) -> Optional[int]:
+        heard = self.rssi.get(address.upper())
+        return max(heard.values()) if heard else None
+
+    def is_weak(self, address: str) -> bool:
+        best = self.best(address)
+        return best is None or best < WEAK_RSSI
+
+    def order(self, addresses: Iterable[str]) -> List[str]:
+        # strong links first, devices that were not heard at all last
+        def key(address):
+            best = self.best(address)
+            return (best is None, -best if best is not None else 0)
+        return sorted(addresses, key=key)
+
+    def pick_adapter(self, address: str, adapters: List[str],
+                     load: Dict[str, int]) -> str:
+        # the adapter hearing the device best, the least loaded one among equals
+        def key(adapter):
+            rssi = self.get(address, adapter)
+            return (rssi is None, -rssi if rssi is not None else 0, load[adapter])
+        return min(adapters, key=key)
+
+
+async def scan_signal_map(adapters: List[Optional[str]], timeout: float) -> SignalMap:
+    signal_map = SignalMap()
+    scans = await asyncio.gather(*(scan_tcat_advertisements(adapter, timeout)
+                                   for adapter in adapters))
+    for advertisements in scans:
+        for advertisement in advertisements:
+            signal_map.add(advertisement)
+    return signal_map
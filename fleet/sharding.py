@@ -0,0 +1,204 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+from ble.ble_session import open_secure_session
+from ble.link_shaper import LinkProfile
+from fleet.concurrency import AimdLimiter
+from fleet.fleet_runner import DeviceResult, FleetOperation, FleetRunner
+from fleet.journal import CommissioningJournal
+from fleet.scheduling import SignalMap
+
+logger = logging.getLogger(__name__)
+
+
+class AdapterMetrics:
+    def __init__(self, adapter: str):
+        self.adapter = adapter
+        self.devices = 0
+        self.succeeded = 0
+        self.busy_time = 0.0
+        self.window: Optional[int] = None
+
+    def __str__(self):
+        mean_time = self.busy_time / self.devices if self.devices else 0.0
+        res = f'{self.adapter}: {self.devices} device(s), ' \
+            f'{self.succeeded} succeeded, {mean_time:.2f} s per device'
+        if self.window is not None:
+            res += f', concurrency window {self.window}'
+        return res
+
+    def add(self, result: DeviceResult):
+        self.devices += 1
+        self.succeeded += result.success
+        if result.finished is not None:
+            self.busy_time += result.finished - result.started
+        if result.window is not None:
+            self.window = result.window
+
+
+def run_shard(operation: FleetOperation, adapter: str, concurrency: int,
+              adaptive: bool, crypto_threads: int, tls_profile: str,
+              link_profile: Optional[LinkProfile], connect,
+              inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+    logging.basicConfig(level=logging.WARNING)
+    crypto_executor = ThreadPoolExecutor(crypto_threads) if crypto_threads else None
+    try:
+        asyncio.run(serve_shard(operation, adapter, concurrency, adaptive,
+                                crypto_executor, tls_profile, link_profile, connect,
+                                inbox, outbox))
+    finally:
+        if crypto_executor is not None:
+            crypto_executor.shutdown()
+
+
+async def serve_shard(operation: FleetOperation, adapter: str, concurrency: int,
+                      adaptive: bool, crypto_executor: Optional[ThreadPoolExecutor],
+                      tls_profile: str, link_profile: Optional[LinkProfile], connect,
+                      inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+    # every adapter has a controller of its own, each one gets a separate window
+    limiter = AimdLimiter(maximum=concurrency) if adaptive else None
+    runner = FleetRunner(operation, adapter=adapter, crypto_executor=crypto_executor,
+                         tls_profile=tls_profile, limiter=limiter,
+                         link_profile=link_profile, connect=connect)
+    loop = asyncio.get_running_loop()
+    # blocking queue reads are done on threads, one per concurrent session
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def worker():
+            while True:
+                address = await loop.run_in_executor(executor, inbox.get)
+                if address is None:
+                    return
+                outbox.put((adapter, await runner.run_device(address)))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            operation.close()
+
+
+# Runs the operation in one worker process per Bluetooth adapter, each with its own
+# event loop. The coordinator hands every device to the least loaded adapter.
+class ShardedRunner(FleetRunner):
+    def __init__(self, operation: FleetOperation, adapters: List[str],
+                 concurrency: int = 4, journal: Optional[CommissioningJournal] = None,
+                 crypto_threads: int = 0, tls_profile: str = 'default',
+                 adaptive: bool = False, signal_map: Optional[SignalMap] = None,
+                 link_profile: Optional[LinkProfile] = None, connect=open_secure_session):
+        super().__init__(operation, concurrency=concurrency, journal=journal,
+                         tls_profile=tls_profile, link_profile=link_profile,
+                         connect=connect)
+        self.adapters = adapters
+        self.adaptive = adaptive
+        # with a signal map, devices go to the adapter hearing them best
+        self.signal_map = signal_map
+        # executors cannot be passed to the worker processes, each creates its own
+        self.crypto_threads = crypto_threads
+        self.metrics: Dict[str, AdapterMetrics] = {}
+
+    async def run_pending(self, addresses: List[str],
+                          report: Callable[[DeviceResult], None]):
+        self.metrics = {adapter: AdapterMetrics(adapter) for adapter in self.adapters}
+        if not addresses:
+            return
+
+        concurrency = max(self.concurrency, 1)
+        context = multiprocessing.get_context('spawn')
+        outbox = context.Queue()
+        inboxes = {adapter: context.Queue() for adapter in self.adapters}
+        workers = {
+            adapter: context.Process(
+                target=run_shard,
+                args=(self.operation, adapter, concurrency, self.adaptive,
+                      self.crypto_threads, self.tls_profile, self.link_profile,
+                      self._connect, inboxes[adapter], outbox),
+                daemon=True)
+            for adapter in self.adapters
+        }
+        in_flight: Dict[str, Set[str]] = {adapter: set() for adapter in self.adapters}
+        pending = deque(addresses)
+        # devices of a worker which exited are given to another one, but only once,
+        # a device crashing every worker would otherwise take them all down
+        requeued: Set[str] = set()
+
+        def fail(address: str, reason: str):
+            result = DeviceResult(address)
+            result.error = reason
+            report(result)
+
+        def assign():
+            while pending:
+                available = [adapter for adapter in self.adapters
+                             if workers[adapter].is_alive()
+                             and len(in_flight[adapter]) < concurrency]
+                if not available:
+                    return
+                address = pending.popleft()
+                load = {adapter: len(in_flight[adapter]) for adapter in available}
+                if self.signal_map is not None:
+                    adapter = self.signal_map.pick_adapter(address, available, load)
+                else:
+                    adapter = min(available, key=load.get)
+                in_flight[adapter].add(address)
+                inboxes[adapter].put(address)
+
+        def collect_dead_workers():
+            for adapter, worker in workers.items():
+                if not worker.is_alive() and in_flight[adapter]:
+                    logger.warning('Worker for adapter %s exited', adapter)
+                    for address in in_flight[adapter]:
+                        if address in requeued:
+                            fail(address, f'worker for adapter {adapter} exited')
+                        else:
+                            requeued.add(address)
+                            pending.appendleft(address)
+                    in_flight[adapter].clear()
+
+        loop = asyncio.get_running_loop()
+        for worker in workers.values():
+            worker.start()
+        try:
+            assign()
+            while any(in_flight.values()):
+                try:
+                    adapter, result = await loop.run_in_executor(
+                        None, outbox.get, True, 0.5)
+                except queue.Empty:
+                    collect_dead_workers()
+                    assign()
+                    continue
+                in_flight[adapter].discard(result.address)
+                self.metrics[adapter].add(result)
+                report(result)
+                collect_dead_workers()
+                assign()
+            while pending:
+                fail(pending.popleft(), 'no adapter available')
+        finally:
+            for adapter, inbox in inboxes.items():
+                for _ in range(concurrency):
+                    inbox.put(None)
+            for worker in workers.values():
+                await loop.run_in_executor(None, worker.join, 5)
+                if worker.is_alive():
+                    worker.terminate()
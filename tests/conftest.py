@@ -0,0 +1,76 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+
+# shared by the tests which need a secure session without a device
+
+SUCCESS = TLV(TcatTLVType.RESPONSE_W_STATUS.value, bytes([0])).to_bytes()
+
+
+class FakeClient:
+    def __init__(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+class FakeSslObject:
+    def __init__(self, certificate):
+        self.certificate = certificate
+
+    def getpeercert(self):
+        return self.certificate
+
+
+# a secure session answering every request with the same response
+class FakeStream:
+    def __init__(self, address=None, response=SUCCESS, certificate=None):
+        self.address = address
+        self.response = response
+        self.client = FakeClient()
+        self.ble_stream = self
+        self.ssl_object = FakeSslObject(certificate)
+        self.handshake_stats = None
+        self.peer_closed = False
+        self.requests = []
+
+    async def send_with_resp(self, data, **kwargs):
+        self.requests.append(data)
+        return self.response
+
+    async def disconnect(self):
+        await self.client.disconnect()
+
+
+# opens a FakeStream for every address which is not unreachable, after the given
+# number of failed attempts
+class FakeConnect:
+    def __init__(self, failures=0, unreachable=(), **stream_args):
+        self.failures = failures
+        self.unreachable = unreachable
+        self.stream_args = stream_args
+        self.calls = []
+        self.streams = {}
+
+    async def __call__(self, address, adapter=None, **kwargs):
+        self.calls.append(address)
+        if self.failures > 0 or address in self.unreachable:
+            self.failures = max(self.failures - 1, 0)
+            raise ConnectionError('Device not found')
+        self.streams[address] = FakeStream(address, **self.stream_args)
+        return self.streams[address]
@@ -0,0 +1,54 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+import pytest
+
+from ble.ble_stream import BleStream, ReceiveBufferOverflow
+
+
+class FakeClient:
+    def __init__(self):
+        self.is_connected = True
+        self.callback = None
+
+    async def start_notify(self, uuid, callback):
+        self.callback = callback
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+def test_exceeding_the_receive_limit_disconnects():
+    client = FakeClient()
+
+    async def run():
+        stream = await BleStream.from_client(client, 'service', 'tx', 'rx',
+                                             receive_limit=100)
+        client.callback(None, bytearray(60))
+        assert stream.buffered == 60
+        # the limit is never exceeded, not even by the notification crossing it
+        client.callback(None, bytearray(60))
+        # the disconnect runs in the background, nothing else is buffered meanwhile
+        client.callback(None, bytearray(10))
+        await asyncio.sleep(0)
+        assert stream.buffered == 0
+        with pytest.raises(ReceiveBufferOverflow):
+            await stream.recv(1000, recv_timeout=0)
+
+    asyncio.run(run())
+    assert not client.is_connected
+
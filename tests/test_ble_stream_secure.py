@@ -0,0 +1,78 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+import ssl
+from os import path
+
+import pytest
+
+from ble.ble_stream_secure import BleStreamSecure
+
+
+# TLS server over memory buffers, standing in for the device below a BleStream
+class TlsPeer:
+    def __init__(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile=path.join('auth', 'commissioner_cert.pem'),
+                                keyfile=path.join('auth', 'commissioner_key.pem'))
+        self.incoming = ssl.MemoryBIO()
+        self.outgoing = ssl.MemoryBIO()
+        self.server = context.wrap_bio(self.incoming, self.outgoing, server_side=True)
+        self.counters = None
+        self.trace = None
+        self.client = self
+        self.is_connected = True
+
+    async def send(self, data):
+        self.incoming.write(data)
+        try:
+            self.server.do_handshake()
+        except ssl.SSLWantReadError:
+            pass
+
+    async def recv(self, buffersize):
+        return self.outgoing.read(buffersize)
+
+
+def open_session(peer):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    session = BleStreamSecure(peer, ssl_context=context)
+
+    async def handshake():
+        await session.do_handshake('device')
+        # the last flight of the client goes out with the first request otherwise
+        await peer.send(session.outgoing.read())
+
+    asyncio.run(handshake())
+    return session
+
+
+def test_close_notify_after_response_ends_the_session():
+    peer = TlsPeer()
+    session = open_session(peer)
+    peer.server.write(b'response')
+    try:
+        peer.server.unwrap()
+    except ssl.SSLWantReadError:
+        # the close_notify is sent, the one of the client is not waited for
+        pass
+
+    assert asyncio.run(session.recv(4096, timeout=1)) == b'response'
+    assert session.peer_closed
+    with pytest.raises(ConnectionError, match='closed by the device'):
+        asyncio.run(session.send(b'request'))
@@ -0,0 +1,55 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+from ble.ble_trace import TraceWriter, TraceRecordType, ReplaySecureStream, read_trace
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+
+NETWORK_KEY = bytes(range(1, 17))
+
+
+def dataset_write():
+    dataset = TLV(5, NETWORK_KEY).to_bytes() + TLV(3, b'net').to_bytes()
+    return TLV(TcatTLVType.ACTIVE_DATASET.value, dataset).to_bytes()
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / 'session.trace')
+    with TraceWriter(path) as trace:
+        trace.record(TraceRecordType.GATT_WRITE, b'\x17\x03\x03')
+        trace.record(TraceRecordType.APP_WRITE, dataset_write())
+        trace.record(TraceRecordType.APP_READ, b'\x01\x01\x00')
+
+    for use_mmap in (False, True):
+        records = list(read_trace(path, use_mmap=use_mmap))
+        assert [type for type, _, _ in records] == [TraceRecordType.GATT_WRITE,
+                                                    TraceRecordType.APP_WRITE,
+                                                    TraceRecordType.APP_READ]
+        assert records[0][2] == b'\x17\x03\x03'
+        assert records[2][2] == b'\x01\x01\x00'
+        timestamps = [timestamp for _, timestamp, _ in records]
+        assert timestamps == sorted(timestamps)
+
+    # the network key never reaches the file, the rest of the dataset is kept
+    written = records[1][2]
+    assert len(written) == len(dataset_write())
+    assert NETWORK_KEY not in written
+    assert b'net' in written
+
+    replay = ReplaySecureStream.load(path, speed=0)
+    response = asyncio.run(replay.send_with_resp(dataset_write()))
+    assert response == b'\x01\x01\x00'
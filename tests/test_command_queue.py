@@ -0,0 +1,58 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+
+from ble.command_queue import CommandQueue, Priority
+
+
+def test_waiting_requests_are_served_by_priority():
+    async def run():
+        queue = CommandQueue()
+        served = []
+
+        async def request(name, priority):
+            async with queue.slot(priority):
+                served.append(name)
+                await asyncio.sleep(0.01)
+
+        async with queue.slot(Priority.BULK):
+            tasks = [asyncio.ensure_future(request(name, priority)) for name, priority in
+                     [('bulk', Priority.BULK), ('status', Priority.NORMAL),
+                      ('stop', Priority.CONTROL), ('status2', Priority.NORMAL)]]
+            await asyncio.sleep(0)
+            assert queue.waiting == 4
+        await asyncio.gather(*tasks)
+        assert not queue.busy
+        return served
+
+    assert asyncio.run(run()) == ['stop', 'status', 'status2', 'bulk']
+
+
+def test_cancelled_waiter_does_not_hold_the_queue():
+    async def run():
+        queue = CommandQueue()
+        await queue.acquire()
+        waiter = asyncio.ensure_future(queue.acquire(Priority.CONTROL))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.wait_for(queue.acquire(), 1)
+        queue.release()
+        return queue.busy
+
+    assert asyncio.run(run()) is False
@@ -0,0 +1,54 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+
+from fleet.concurrency import AimdLimiter
+
+
+def test_window_grows_on_success_and_halves_once_per_congestion():
+    async def run():
+        limiter = AimdLimiter(initial=2, maximum=8)
+        for _ in range(50):
+            ticket = await limiter.acquire()
+            await limiter.on_success(ticket, latency=1.0)
+            await limiter.release()
+        grown = limiter.limit
+
+        tickets = [await limiter.acquire() for _ in range(grown)]
+        for ticket in tickets:
+            await limiter.on_failure(ticket)
+            await limiter.release()
+        return grown, limiter
+
+    grown, limiter = asyncio.run(run())
+    assert grown == 8
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+
+def test_high_latency_decreases_window():
+    async def run():
+        limiter = AimdLimiter(initial=4)
+        ticket = await limiter.acquire()
+        await limiter.on_success(ticket, latency=1.0)
+        await limiter.release()
+        ticket = await limiter.acquire()
+        await limiter.on_success(ticket, latency=5.0)
+        await limiter.release()
+        return limiter
+
+    assert asyncio.run(run()).limit == 2
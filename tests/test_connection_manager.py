@@ -0,0 +1,98 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+from ble.connection_manager import ConnectionManager
+from conftest import FakeConnect
+from cli.base_commands import ScanCommand
+from utils.retry import RetryPolicy
+
+
+def test_dropped_session_is_reconnected():
+    connect = FakeConnect()
+
+    async def run():
+        manager = ConnectionManager(connect=connect, keepalive_interval=None)
+        first = await manager.get('A')
+        assert await manager.get('A') is first
+        first.client.is_connected = False
+        second = await manager.get('A')
+        await manager.close_all()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second is not first
+    assert connect.calls == ['A', 'A']
+
+
+def test_failed_connections_are_retried_after_backoff():
+    connect = FakeConnect(failures=2)
+    policy = RetryPolicy(timeout=None, attempts=3, initial_backoff=0.05, jitter=0)
+
+    async def run():
+        manager = ConnectionManager(connect=connect, keepalive_interval=None,
+                                    retry_policy=policy)
+        start = asyncio.get_running_loop().time()
+        await manager.get('A')
+        elapsed = asyncio.get_running_loop().time() - start
+        await manager.close_all()
+        return elapsed
+
+    # backoff of 0.05 s after the first failure and 0.1 s after the second one
+    assert asyncio.run(run()) >= 0.15
+    assert connect.calls == ['A', 'A', 'A']
+
+
+def test_idle_sessions_are_closed():
+    async def run():
+        manager = ConnectionManager(connect=FakeConnect(), idle_ttl=0.05,
+                                    keepalive_interval=None)
+        stream = await manager.get('A')
+        await asyncio.sleep(0.2)
+        sessions = dict(manager.sessions)
+        await manager.close_all()
+        return stream, sessions
+
+    stream, sessions = asyncio.run(run())
+    assert sessions == {}
+    assert not stream.client.is_connected
+
+
+def test_scan_closes_previous_session(monkeypatch):
+    class Device:
+        address = 'B'
+
+    async def scan_tcat_devices(adapter=None):
+        return [Device()]
+
+    monkeypatch.setattr('ble.ble_scanner.scan_tcat_devices', scan_tcat_devices)
+    monkeypatch.setattr('cli.base_commands.select_device_by_user_input',
+                        lambda devices: devices[0])
+
+    async def run():
+        manager = ConnectionManager(connect=FakeConnect(), keepalive_interval=None)
+        previous = await manager.get('A')
+        context = {'connection_manager': manager, 'address': 'A',
+                   'ble_sstream': previous}
+        await ScanCommand().execute_default([], context)
+        sessions = list(manager.sessions)
+        await manager.close_all()
+        return previous, context, sessions
+
+    previous, context, sessions = asyncio.run(run())
+    assert context['address'] == 'B'
+    assert sessions == ['B']
+    assert not previous.client.is_connected
@@ -0,0 +1,107 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from conftest import FakeConnect
+from dataset.dataset import ThreadDataset
+from dataset.dataset_bank import DatasetBank, write_bank
+from fleet.fleet_runner import FleetRunner
+from fleet.operations import BankCommissionOperation
+from tlv.dataset_tlv import MeshcopTlvType
+from tlv.tlv import TLV
+
+
+def test_bank_stores_each_dataset_once(tmp_path):
+    first = ThreadDataset().to_bytes()
+    second = ThreadDataset()
+    second.set_entry(MeshcopTlvType.CHANNEL, ['15'])
+    second = second.to_bytes()
+    devices = [(f'AA:BB:CC:00:00:{i:02X}', first if i % 2 else second)
+               for i in range(10)]
+    devices.append(('0BADC0DE-0000-4000-8000-000000000001', second))
+    path = str(tmp_path / 'bank.dsb')
+    write_bank(path, devices)
+
+    with DatasetBank(path) as bank:
+        assert len(bank) == 11
+        assert bank.dataset_count == 2
+        assert 'aa:bb:cc:00:00:03' in bank
+        assert 'AA:BB:CC:00:00:0A' not in bank
+
+        view = bank.lookup('AA:BB:CC:00:00:03')
+        assert isinstance(view, memoryview) and view == first
+        assert ThreadDataset(view).get_entry(MeshcopTlvType.CHANNEL).channel == 18
+        view.release()
+
+        view = bank.lookup('0BADC0DE-0000-4000-8000-000000000001')
+        assert ThreadDataset(view).get_entry(MeshcopTlvType.CHANNEL).channel == 15
+        view.release()
+
+        view = bank.get(hashlib.sha256(first).digest())
+        assert view == first
+        view.release()
+
+
+def test_damaged_banks_are_rejected(tmp_path):
+    dataset = ThreadDataset().to_bytes()
+    path = tmp_path / 'bank.dsb'
+    write_bank(str(path), [('AA:BB:CC:00:00:01', dataset)])
+    content = path.read_bytes()
+
+    def damaged(data):
+        path.write_bytes(data)
+        with pytest.raises(ValueError):
+            DatasetBank(str(path), verify=True)
+
+    damaged(content[:-1])
+    damaged(content + b'\0')
+    # a flipped bit in the device table
+    position = len(content) - len(dataset) - 1
+    damaged(content[:position] + bytes([content[position] ^ 1]) +
+            content[position + 1:])
+
+    # without verify, only the header is checked on opening
+    path.write_bytes(content + b'\0')
+    DatasetBank(str(path)).close()
+
+    # datasets are checked when they are read
+    path.write_bytes(content[:-1] + bytes([content[-1] ^ 1]))
+    with DatasetBank(str(path)) as bank:
+        with pytest.raises(ValueError, match='corrupted'):
+            bank.lookup('AA:BB:CC:00:00:01')
+
+
+def test_bank_commission_sends_each_device_its_dataset(tmp_path):
+    datasets = {}
+    for i in range(3):
+        dataset = ThreadDataset()
+        dataset.set_entry(MeshcopTlvType.CHANNEL, [str(11 + i)])
+        datasets[f'AA:BB:CC:00:00:0{i}'] = dataset.to_bytes()
+    path = str(tmp_path / 'bank.dsb')
+    write_bank(path, datasets.items())
+    connect = FakeConnect()
+    operation = BankCommissionOperation(path)
+    results = asyncio.run(FleetRunner(operation, connect=connect).run(list(datasets)))
+    assert all(result.success for result in results)
+    for address, stream in connect.streams.items():
+        requests = [TLV.from_bytes(request).value for request in stream.requests]
+        assert requests == [datasets[address]]
+    # the bank is closed when the run ends
+    assert operation._bank is None
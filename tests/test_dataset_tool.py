@@ -0,0 +1,41 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import json
+
+from dataset.dataset import ThreadDataset, initial_dataset
+from dataset.dataset_tool import parse_modification, process_lines
+from tlv.dataset_tlv import MeshcopTlvType
+
+
+def test_rewrite_applies_modifications_in_input_order():
+    lines = [(str(i), initial_dataset.hex()) for i in range(50)]
+    lines.insert(10, ('bad', 'zz'))
+    modification = parse_modification('networkname=Rewritten')
+    results = list(process_lines(iter(lines), 'rewrite', [modification],
+                                 jobs=2, chunk_size=7))
+
+    assert [position for position, _, _ in results] == [p for p, _ in lines]
+    assert results[10][:2] == ('bad', False)
+    ds = ThreadDataset(bytes.fromhex(results[0][2]))
+    assert ds.get_entry(MeshcopTlvType.NETWORKNAME).data == 'Rewritten'
+
+
+def test_decode_outputs_json():
+    results = list(process_lines(iter([('1', initial_dataset.hex())]), 'decode', [],
+                                 jobs=1, chunk_size=1))
+    decoded = json.loads(results[0][2])
+    assert decoded['NETWORKNAME'] == {'data': 'OpenThread-c64e'}
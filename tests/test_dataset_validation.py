@@ -0,0 +1,50 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import pytest
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_validation import check_dataset, validate_dataset
+from tlv.dataset_tlv import MeshcopTlvType
+
+
+def test_initial_dataset_is_valid():
+    assert validate_dataset(ThreadDataset()) == []
+
+
+def test_invalid_entries_are_reported():
+    ds = ThreadDataset()
+    ds.get_entry(MeshcopTlvType.CHANNEL).channel = 27
+    ds.get_entry(MeshcopTlvType.PANID).data = 'ffff'
+    ds.get_entry(MeshcopTlvType.NETWORKKEY).data = 'zz' * 16
+    del ds.entries[MeshcopTlvType.PSKC]
+
+    errors = validate_dataset(ds)
+    assert len(errors) == 4
+    assert errors[0] == 'PSKC: missing'
+    with pytest.raises(ValueError):
+        check_dataset(ds)
+
+
+def test_timestamp_and_delay_timer_round_trip():
+    ds = ThreadDataset()
+    ds.set_entry(MeshcopTlvType.ACTIVETIMESTAMP, ['70000'])
+    pending = bytes.fromhex('34040000ea60')
+    ds = ThreadDataset(ds.to_bytes() + pending)
+
+    assert ds.get_entry(MeshcopTlvType.ACTIVETIMESTAMP).seconds == 70000
+    assert ds.get_entry(MeshcopTlvType.DELAYTIMER).time_remaining == 60000
+    assert validate_dataset(ds) == []
@@ -0,0 +1,60 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+import pytest
+
+from cli.base_commands import DecommissionCommand
+from conftest import FakeConnect, FakeStream
+from fleet.fleet_runner import FleetRunner
+from fleet.journal import CommissioningJournal
+from fleet.operations import DecommissionOperation
+
+def test_returned_devices_are_decommissioned_in_a_new_run(tmp_path):
+    path = str(tmp_path / 'journal.db')
+
+    def run(run_id):
+        with CommissioningJournal(path) as journal:
+            runner = FleetRunner(DecommissionOperation(run_id), journal=journal,
+                                 connect=FakeConnect())
+            results = asyncio.run(runner.run(['A', 'B']))
+        return [result.skipped for result in results]
+
+    assert run('20261019T091500') == [False, False]
+    # restarting the same run skips the devices done
+    assert run('20261019T091500') == [True, True]
+    # devices returned again the same day are handled in the next run
+    assert run('20261019T143000') == [False, False]
+
+
+class FakeManager:
+    def __init__(self, ble_sstream):
+        self.ble_sstream = ble_sstream
+        self.closed = []
+
+    async def get(self, address):
+        return self.ble_sstream
+
+    async def close(self, address):
+        self.closed.append(address)
+
+
+def test_session_is_closed_without_response():
+    manager = FakeManager(FakeStream(response=b''))
+    context = {'address': 'A', 'connection_manager': manager, 'ble_sstream': None}
+    with pytest.raises(TimeoutError):
+        asyncio.run(DecommissionCommand().execute_default([], context))
+    assert manager.closed == ['A']
@@ -0,0 +1,97 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import time
+from argparse import Namespace
+
+from bbtc import connect_by_args
+from ble.connection_manager import ConnectionManager
+from ble.device_cache import DeviceCache
+from ble.link_calibration import LinkCalibration, WITH_RESPONSE, WRITE_WITHOUT_RESPONSE
+
+
+def test_addresses_persist_and_expire(tmp_path):
+    path = str(tmp_path / 'cache' / 'devices.json')
+    DeviceCache(path).store('Thread BLE', 'AA:BB:CC:DD:EE:01', 'hci1')
+
+    cache = DeviceCache(path)
+    assert cache.lookup('Thread BLE') == 'AA:BB:CC:DD:EE:01'
+    assert cache.lookup('Other') is None
+    assert cache.lookup_adapter('Thread BLE') == 'hci1'
+    cache.entries['Thread BLE']['last_seen'] -= cache.max_age + 1
+    assert cache.lookup('Thread BLE') is None
+    assert cache.lookup_adapter('Thread BLE') is None
+
+    cache.forget('Thread BLE')
+    assert DeviceCache(path).entries == {}
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    path = tmp_path / 'devices.json'
+    path.write_text('{not json')
+    assert DeviceCache(str(path)).lookup('Thread BLE') is None
+
+
+def test_link_calibration_is_stored_per_address(tmp_path):
+    path = str(tmp_path / 'devices.json')
+    # caches written before link calibration hold the device entries only
+    (tmp_path / 'devices.json').write_text(
+        '{"Thread BLE": {"address": "AA:BB:CC:DD:EE:01", "adapter": null, '
+        f'"last_seen": {time.time()}}}}}')
+    cache = DeviceCache(path)
+    assert cache.lookup('Thread BLE') == 'AA:BB:CC:DD:EE:01'
+    assert cache.lookup_link('AA:BB:CC:DD:EE:01') is None
+
+    calibration = LinkCalibration()
+    calibration.choose_write_mode([WRITE_WITHOUT_RESPONSE, WITH_RESPONSE])
+    calibration.record_write(128)
+    calibration.record_notification(20)
+    cache.store_link('aa:bb:cc:dd:ee:01', calibration.finish().to_dict())
+
+    cache = DeviceCache(path)
+    assert cache.lookup('Thread BLE') == 'AA:BB:CC:DD:EE:01'
+    stored = LinkCalibration.from_dict(cache.lookup_link('AA:BB:CC:DD:EE:01'))
+    assert stored.write_mode == WRITE_WITHOUT_RESPONSE
+    assert (stored.write_size, stored.notification_size) == (128, 20)
+    cache.forget_link('AA:BB:CC:DD:EE:01')
+    assert DeviceCache(path).lookup_link('AA:BB:CC:DD:EE:01') is None
+
+
+def test_cached_adapter_is_used_unless_given(tmp_path):
+    cache = DeviceCache(str(tmp_path / 'devices.json'))
+    cache.store('Thread BLE', 'AA:BB:CC:DD:EE:01', 'hci1')
+    adapters = []
+
+    async def connect(address, adapter=None):
+        adapters.append(adapter)
+        return object()
+
+    async def run(adapter):
+        args = Namespace(mac=None, name='Thread BLE', adapter=adapter)
+        manager = ConnectionManager(adapter=adapter, connect=connect,
+                                    keepalive_interval=None)
+        await connect_by_args(args, manager, cache)
+        # only the session with the device uses the cached adapter
+        assert manager.adapter == adapter
+        assert manager.sessions['AA:BB:CC:DD:EE:01'].adapter == adapters[-1]
+        await manager.close_all()
+
+    asyncio.run(run(None))
+    asyncio.run(run('hci0'))
+    assert adapters == ['hci1', 'hci0']
+    # the adapter that worked is remembered
+    assert cache.lookup_adapter('Thread BLE') == 'hci0'
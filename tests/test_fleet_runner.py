@@ -0,0 +1,34 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from fleet.fleet_runner import DeviceResult
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+
+
+def test_only_tcat_responses_are_results():
+    result = DeviceResult('A')
+    result.set_response(TLV(TcatTLVType.RESPONSE_W_STATUS.value, b'\x00'))
+    assert result.success
+
+    result = DeviceResult('A')
+    result.set_response(TLV(TcatTLVType.RESPONSE_W_STATUS.value, b'\x02'))
+    assert not result.success and result.status == 2
+
+    result = DeviceResult('A')
+    result.set_response(TLV(TcatTLVType.APPLICATION.value, b'\x00'))
+    assert not result.success
+    assert result.error == 'Unexpected response of type 0x82'
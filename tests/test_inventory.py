@@ -0,0 +1,51 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+import csv
+import io
+
+from conftest import FakeConnect
+from fleet.fleet_runner import FleetRunner
+from fleet.inventory import InventoryOperation, InventoryWriter
+
+CERTIFICATE = {
+    'subject': ((('countryName', 'NO'),), (('organizationName', 'Vendor AS'),),
+                (('commonName', 'Thermostat'),), (('serialNumber', 'SN-0042'),)),
+    'serialNumber': '1A2B',
+    'notAfter': 'Jan  1 00:00:00 2030 GMT',
+}
+
+
+def test_inventory_reads_the_device_certificate():
+    connect = FakeConnect(unreachable=['B'], certificate=CERTIFICATE)
+    file = io.StringIO()
+    writer = InventoryWriter(file)
+    runner = FleetRunner(InventoryOperation(), connect=connect)
+    results = asyncio.run(runner.run(['A', 'B'], on_result=writer.write))
+
+    assert [result.success for result in results] == [True, False]
+    # everything comes from the handshake, nothing is sent to the device
+    assert connect.streams['A'].requests == []
+    assert results[0].to_record()['details']['serial_number'] == 'SN-0042'
+
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+    assert rows[0]['address'] == 'A'
+    assert rows[0]['organization'] == 'Vendor AS'
+    assert rows[0]['common_name'] == 'Thermostat'
+    assert rows[0]['certificate_serial'] == '1A2B'
+    assert rows[1]['address'] == 'B'
+    assert rows[1]['error'] == 'Device not found'
+    assert rows[1]['common_name'] == ''
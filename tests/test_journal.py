@@ -0,0 +1,39 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from types import SimpleNamespace
+
+from fleet.journal import CommissioningJournal
+
+
+def make_result(address, status=0, error=None):
+    return SimpleNamespace(address=address, status=status, error=error,
+                           started=1.0, finished=2.0)
+
+
+def test_completed_devices_survive_reopening(tmp_path):
+    db_path = str(tmp_path / 'journal.db')
+    with CommissioningJournal(db_path, batch_size=10) as journal:
+        journal.record('commission', 'hash1', make_result('A'))
+        journal.record('commission', 'hash1', make_result('B', status=1))
+        journal.record('commission', 'hash1', make_result('C', error='timeout'))
+        journal.record('commission', 'hash2', make_result('D'))
+
+    with CommissioningJournal(db_path) as journal:
+        assert journal.completed('commission', 'hash1') == {'A'}
+        assert journal.completed('commission', 'hash2') == {'D'}
+        journal.record('commission', 'hash2', make_result('A'))
+        assert journal.completed('commission', 'hash1') == set()
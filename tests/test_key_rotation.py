@@ -0,0 +1,47 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import pytest
+
+from dataset.dataset import ThreadDataset
+from dataset.pending_dataset import build_pending_dataset
+from fleet.key_rotation import (KeyRotationOperation, estimate_switch_delay,
+                                DEVICE_TIME_ESTIMATE, SWITCH_MARGIN)
+from tlv.dataset_tlv import MeshcopTlvType
+
+
+def test_switch_delay_covers_every_round_of_devices():
+    assert estimate_switch_delay(8, 4) == 2 * DEVICE_TIME_ESTIMATE + SWITCH_MARGIN
+    assert estimate_switch_delay(9, 4) == 3 * DEVICE_TIME_ESTIMATE + SWITCH_MARGIN
+    assert estimate_switch_delay(3, 0) == 3 * DEVICE_TIME_ESTIMATE + SWITCH_MARGIN
+    assert estimate_switch_delay(0, 4) == SWITCH_MARGIN
+
+
+def test_request_carries_the_remaining_delay():
+    key = '00112233445566778899aabbccddeeff'
+    pending = build_pending_dataset(ThreadDataset(), key, now=1700000000)
+    operation = KeyRotationOperation(pending, switch_time=1000.0, tlv_type=0x21)
+
+    request = operation.build_request(now=900.0)
+    assert request.type == 0x21
+    sent = ThreadDataset(request.value)
+    assert sent.get_entry(MeshcopTlvType.DELAYTIMER).time_remaining == 100000
+    assert sent.get_entry(MeshcopTlvType.NETWORKKEY).data == key
+    # later devices get a shorter delay, for the same switch time
+    later = ThreadDataset(operation.build_request(now=990.0).value)
+    assert later.get_entry(MeshcopTlvType.DELAYTIMER).time_remaining == 10000
+
+    with pytest.raises(TimeoutError):
+        operation.build_request(now=997.0)
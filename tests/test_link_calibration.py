@@ -0,0 +1,83 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+import pytest
+
+from ble.ble_stream import BleStream
+from ble.link_calibration import LinkCalibration, WITH_RESPONSE, WRITE_WITHOUT_RESPONSE
+
+
+def test_write_mode_follows_capability_and_failures():
+    calibration = LinkCalibration()
+    modes = [WRITE_WITHOUT_RESPONSE, WITH_RESPONSE]
+    assert calibration.choose_write_mode(modes) == WRITE_WITHOUT_RESPONSE
+    # the mode does not depend on how long a reply took
+    calibration.record_write(128)
+    calibration.record_notification(64)
+    calibration.record_notification(20)
+    assert calibration.finish().write_mode == WRITE_WITHOUT_RESPONSE
+    assert (calibration.write_size, calibration.notification_size) == (128, 64)
+    assert 'write_latency' not in calibration.to_dict()
+
+    # the characteristic allows writes with response only
+    calibration = LinkCalibration()
+    assert calibration.choose_write_mode([WITH_RESPONSE]) == WITH_RESPONSE
+
+    # writes without response failed once, they are not safe on this link
+    calibration = LinkCalibration()
+    calibration.choose_write_mode(modes)
+    calibration.record_failure(WRITE_WITHOUT_RESPONSE)
+    assert calibration.failed
+    assert calibration.choose_write_mode(modes) == WITH_RESPONSE
+    assert calibration.finish().write_mode == WITH_RESPONSE
+
+
+class FailingClient:
+    def __init__(self):
+        self.is_connected = True
+        self.services = self
+        self.max_write_without_response_size = 20
+        self.writes = []
+
+    def get_service(self, uuid):
+        return self
+
+    def get_characteristic(self, uuid):
+        return self
+
+    async def start_notify(self, uuid, callback):
+        pass
+
+    async def write_gatt_char(self, char, data, response=False):
+        self.writes.append((bytes(data), response))
+        if len(self.writes) == 2:
+            raise OSError('Write failed')
+
+
+def test_failed_write_is_not_sent_again():
+    client = FailingClient()
+
+    async def run():
+        stream = await BleStream.from_client(client, 'service', 'tx', 'rx')
+        with pytest.raises(OSError):
+            await stream.send(bytes(50))
+        return stream.calibration
+
+    calibration = asyncio.run(run())
+    # the second chunk failed, the session is given up instead of sending it again
+    assert client.writes == [(bytes(20), False), (bytes(20), False)]
+    assert calibration.finish().write_mode == WITH_RESPONSE
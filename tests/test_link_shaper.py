@@ -0,0 +1,103 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+
+from ble import link_shaper
+from ble.link_shaper import LinkProfile, ShapedClient
+
+
+class EchoClient:
+    # echoes every write back as a notification
+    def __init__(self):
+        self.is_connected = True
+        self.callback = None
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def start_notify(self, uuid, callback):
+        self.callback = callback
+
+    async def write_gatt_char(self, char, data, response=False):
+        self.callback(char, bytearray(data))
+
+
+def test_parse_profile():
+    profile = LinkProfile.parse('weak,seed=3,fragment=10')
+    assert (profile.fragment, profile.seed, profile.latency) == (10, 3, 0.08)
+    assert LinkProfile.parse('drop=0.5').drop == 0.5
+
+
+def test_shaped_link_keeps_data_order():
+    async def run():
+        received = bytearray()
+        client = ShapedClient(EchoClient(), LinkProfile.parse(
+            'latency=0.001,jitter=0.01,fragment=3,reorder=0.5'), 'AA:BB:CC:00:00:01')
+        await client.start_notify(None, lambda char, data: received.extend(data))
+        sent = bytes(range(200))
+        await asyncio.gather(*(client.write_gatt_char(None, sent[i:i + 20])
+                               for i in range(0, len(sent), 20)))
+        await asyncio.sleep(0.05)
+        return received == sent, client.notifications
+
+    assert asyncio.run(run()) == (True, 70)
+
+
+def test_shaped_link_is_reproducible():
+    async def run(seed):
+        # as in a new process
+        link_shaper._session_numbers.clear()
+        client = ShapedClient(EchoClient(), LinkProfile(drop=0.3, seed=seed),
+                              'AA:BB:CC:00:00:01')
+        await client.start_notify(None, lambda char, data: None)
+        for _ in range(100):
+            await client.write_gatt_char(None, b'x')
+        return client.dropped
+
+    assert asyncio.run(run(1)) == asyncio.run(run(1))
+    assert asyncio.run(run(1)) != asyncio.run(run(2))
+
+
+def test_session_numbers_are_bounded(monkeypatch):
+    monkeypatch.setattr(link_shaper, 'MAX_NUMBERED_ADDRESSES', 2)
+    link_shaper._session_numbers.clear()
+    numbers = [link_shaper._next_session_number(address)
+               for address in ['A', 'A', 'B', 'A', 'C', 'B']]
+    # B was the least recently used when C came, it starts over
+    assert numbers == [0, 1, 0, 2, 0, 0]
+    assert len(link_shaper._session_numbers) == 2
+
+
+def test_lost_link_is_disconnected():
+    echo = EchoClient()
+
+    async def run():
+        client = ShapedClient(echo, LinkProfile(disconnect=1.0))
+        try:
+            await client.write_gatt_char(None, b'x')
+        except ConnectionError:
+            pass
+        # the disconnect is kept until it completes
+        assert len(client._tasks) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return client
+
+    client = asyncio.run(run())
+    assert client.disconnects == 1
+    assert not echo.is_connected
+    assert not client._tasks
@@ -0,0 +1,56 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import time
+
+from utils.loop_monitor import LoopLagMonitor
+
+
+def test_blocking_call_shows_as_lag():
+    async def run():
+        async with LoopLagMonitor(interval=0.01) as monitor:
+            await asyncio.sleep(0.05)
+            time.sleep(0.2)
+            await asyncio.sleep(0.05)
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.count >= 2
+    assert monitor.max >= 0.15
+    assert monitor.percentile(1.0) == monitor.max
+
+
+def test_slow_callback_is_reported_with_coroutine_stack(caplog):
+    async def blocking_step():
+        await asyncio.sleep(0.01)
+        time.sleep(0.1)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        async with LoopLagMonitor(interval=0.01,
+                                  slow_callback_duration=0.05) as monitor:
+            await asyncio.gather(blocking_step(), asyncio.sleep(0.2))
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.slow_callback_count == 1
+    slow = monitor.slowest(1)[0]
+    assert slow.duration >= 0.1
+    assert 'blocking_step' in ''.join(slow.stack)
+    assert monitor.metrics()['slow_callbacks'] == 1
+    # the warning of asyncio itself is not logged as well
+    assert not [record for record in caplog.records if 'Executing' in record.getMessage()]
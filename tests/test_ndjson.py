@@ -0,0 +1,41 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import json
+
+from cli.command import CommandResultTLV
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+from utils.ndjson import NdjsonWriter
+
+
+def test_command_results_are_written_one_per_line():
+    stream = io.BytesIO()
+    writer = NdjsonWriter(stream)
+    response = TLV(TcatTLVType.RESPONSE_W_STATUS.value, bytes([0]))
+    writer.write({'command': 'thread start',
+                  'result': CommandResultTLV(response).to_record()})
+    writer.write({'command': 'hello', 'error': 'No response'})
+    writer.flush()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    first = json.loads(lines[0])
+    assert first['command'] == 'thread start'
+    assert first['result']['type'] == 'RESPONSE_W_STATUS'
+    assert first['result']['value'] == '00'
+    assert json.loads(lines[1]) == {'command': 'hello', 'error': 'No response'}
@@ -0,0 +1,41 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from dataset.dataset import ThreadDataset
+from dataset.network_planner import NetworkPlanner, mask_to_channels
+from tlv.dataset_tlv import MeshcopTlvType
+
+
+def test_mask_to_channels():
+    assert mask_to_channels(bytes.fromhex('001fffe0')) == list(range(11, 27))
+
+
+def test_planned_networks_do_not_collide_within_site():
+    planner = NetworkPlanner(seed=1)
+    existing = ThreadDataset()
+    planner.add_existing(existing, 'site')
+    template = ThreadDataset()
+
+    planned = [planner.plan(template, 'site') for _ in range(159)]
+    for type in [MeshcopTlvType.PANID, MeshcopTlvType.EXTPANID,
+                 MeshcopTlvType.MESHLOCALPREFIX]:
+        values = [ds.get_entry(type).data for ds in planned + [existing]]
+        assert len(set(values)) == len(values)
+
+    channels = [ds.get_entry(MeshcopTlvType.CHANNEL).channel for ds in planned]
+    # the existing network uses channel 18, 160 networks spread over 16 channels
+    assert all(channels.count(c) == 10 for c in range(11, 27) if c != 18)
+    assert channels.count(18) == 9
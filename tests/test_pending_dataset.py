@@ -0,0 +1,46 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from dataset.dataset import ThreadDataset
+from dataset.dataset_validation import validate_dataset
+from dataset.pending_dataset import (PENDING_DATASET_FIELDS, build_pending_dataset,
+                                     pending_to_active)
+from tlv.dataset_tlv import MeshcopTlvType
+
+
+def test_pending_dataset_replaces_the_network_key():
+    active = ThreadDataset()
+    active.set_entry(MeshcopTlvType.ACTIVETIMESTAMP, ['2000000000'])
+    key = '00112233445566778899aabbccddeeff'
+    pending = build_pending_dataset(active, key, now=1700000000.5)
+
+    assert validate_dataset(pending, PENDING_DATASET_FIELDS) == []
+    assert pending.get_entry(MeshcopTlvType.NETWORKKEY).data == key
+    assert pending.get_entry(MeshcopTlvType.PENDINGTIMESTAMP).seconds == 1700000000
+    # the new active timestamp must be newer than the current one
+    assert pending.get_entry(MeshcopTlvType.ACTIVETIMESTAMP).seconds == 2000000001
+
+    new_active = pending_to_active(pending)
+    assert MeshcopTlvType.DELAYTIMER not in new_active.entries
+    assert validate_dataset(new_active) == []
+    assert active.get_entry(MeshcopTlvType.NETWORKKEY).data != key
+
+
+def test_network_key_is_random_by_default():
+    first = build_pending_dataset(ThreadDataset())
+    second = build_pending_dataset(ThreadDataset())
+    assert first.get_entry(MeshcopTlvType.NETWORKKEY).data != \
+        second.get_entry(MeshcopTlvType.NETWORKKEY).data
@@ -0,0 +1,62 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+
+import pytest
+
+from utils.retry import RetryPolicy
+
+
+def test_stuck_attempts_are_cancelled_and_retried():
+    calls = []
+    retries = []
+
+    async def operation():
+        calls.append(len(calls))
+        if len(calls) < 3:
+            await asyncio.sleep(10)
+        return 'done'
+
+    async def on_retry():
+        retries.append(len(calls))
+
+    policy = RetryPolicy(timeout=0.05, attempts=3, initial_backoff=0.01)
+    assert asyncio.run(policy.run(operation, 'op', on_retry)) == 'done'
+    assert calls == [0, 1, 2]
+    assert retries == [1, 2]
+
+
+def test_last_failure_is_raised():
+    async def operation():
+        await asyncio.sleep(10)
+
+    policy = RetryPolicy(timeout=0.01, attempts=2, initial_backoff=0.01)
+    with pytest.raises(TimeoutError, match='op timed out'):
+        asyncio.run(policy.run(operation, 'op'))
+
+    async def failing():
+        raise ValueError('bad')
+
+    with pytest.raises(ValueError):
+        asyncio.run(RetryPolicy(timeout=None, retry_on=(ConnectionError,)).run(failing))
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(timeout=1.0, attempts=5, initial_backoff=1.0, max_backoff=4.0,
+                         jitter=0.5)
+    for attempt, full in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 4.0)]:
+        assert full * 0.5 <= policy.backoff(attempt) <= full
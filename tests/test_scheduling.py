@@ -0,0 +1,54 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+from fleet.scheduling import SignalMap
+
+
+class FakeAdvertisement:
+    def __init__(self, address, adapter, rssi):
+        self.address = address
+        self.adapter = adapter
+        self.rssi = rssi
+
+
+def signal_map(*heard):
+    res = SignalMap()
+    for address, adapter, rssi in heard:
+        res.add(FakeAdvertisement(address, adapter, rssi))
+    return res
+
+
+def test_strong_devices_are_scheduled_first():
+    signals = signal_map(('aa:01', 'hci0', -90), ('AA:02', 'hci0', -60),
+                         ('AA:03', 'hci0', -95), ('AA:03', 'hci1', -70))
+    # addresses match regardless of case, the best adapter counts
+    assert signals.best('AA:01') == -90
+    assert signals.best('aa:03') == -70
+    assert signals.order(['AA:04', 'AA:01', 'AA:03', 'AA:02']) == \
+        ['AA:02', 'AA:03', 'AA:01', 'AA:04']
+    assert signals.is_weak('AA:01')
+    assert signals.is_weak('AA:04')
+    assert not signals.is_weak('AA:03')
+
+
+def test_device_goes_to_adapter_hearing_it_best():
+    signals = signal_map(('AA:01', 'hci0', -80), ('AA:01', 'hci1', -60),
+                         ('AA:02', 'hci0', -70), ('AA:02', 'hci1', -70))
+    load = {'hci0': 3, 'hci1': 1}
+    assert signals.pick_adapter('AA:01', ['hci0', 'hci1'], load) == 'hci1'
+    # equally heard or not heard at all, the least loaded adapter is used
+    assert signals.pick_adapter('AA:02', ['hci0', 'hci1'], {'hci0': 0, 'hci1': 1}) == \
+        'hci0'
+    assert signals.pick_adapter('AA:03', ['hci0', 'hci1'], load) == 'hci1'
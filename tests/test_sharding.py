@@ -0,0 +1,68 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import os
+
+from conftest import FakeStream
+from fleet.fleet_runner import FleetOperation
+from fleet.sharding import ShardedRunner
+from tlv.tlv import TLV
+from tlv.tcat_tlv import TcatTLVType
+
+ADAPTERS = ['hci0', 'hci1']
+
+
+# runs in the worker processes, in place of opening a secure session
+async def fake_connect(address, adapter=None, **kwargs):
+    if address == 'CRASH' and adapter == 'hci0':
+        os._exit(1)
+    await asyncio.sleep(0.05)
+    return FakeStream(address)
+
+
+class SucceedingOperation(FleetOperation):
+    def get_name(self) -> str:
+        return 'test'
+
+    async def execute(self, ble_sstream) -> TLV:
+        return TLV(TcatTLVType.RESPONSE_W_STATUS.value, b'\x00')
+
+
+def run(addresses):
+    runner = ShardedRunner(SucceedingOperation(), ADAPTERS, concurrency=2,
+                           connect=fake_connect)
+    results = asyncio.run(runner.run(addresses))
+    return results, runner.metrics
+
+
+def test_devices_are_spread_over_adapters():
+    addresses = [f'AA:BB:CC:00:00:{i:02X}' for i in range(8)]
+    results, metrics = run(addresses)
+    assert sorted(result.address for result in results) == addresses
+    assert all(result.success for result in results)
+    assert sum(metrics[adapter].devices for adapter in ADAPTERS) == 8
+    # the least loaded adapter gets the next device, both are kept busy
+    assert all(metrics[adapter].devices >= 2 for adapter in ADAPTERS)
+
+
+def test_devices_of_exited_worker_are_requeued():
+    # the first device goes to hci0, which exits while handling it
+    addresses = ['CRASH'] + [f'AA:BB:CC:00:00:{i:02X}' for i in range(5)]
+    results, metrics = run(addresses)
+    assert sorted(result.address for result in results) == sorted(addresses)
+    assert all(result.success for result in results), [str(r) for r in results]
+    assert metrics['hci1'].devices >= 2
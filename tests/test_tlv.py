@@ -0,0 +1,34 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from tlv.tlv import TLV, TLVStreamParser
+
+
+def test_long_tlv_round_trip():
+    tlv = TLV(0x82, bytes(range(256)) * 2)
+    encoded = tlv.to_bytes()
+    assert encoded[:4] == bytes([0x82, 0xFF, 0x02, 0x00])
+    assert TLV.from_bytes(encoded).value == tlv.value
+
+
+def test_stream_parser_handles_split_input():
+    data = TLV(0x01, b'\x00').to_bytes() + TLV(0x82, b'x' * 300).to_bytes()
+    parser = TLVStreamParser()
+    tlvs = []
+    for i in range(0, len(data), 3):
+        tlvs += parser.feed(data[i:i + 3])
+    assert [(tlv.type, len(tlv.value)) for tlv in tlvs] == [(0x01, 1), (0x82, 300)]
+    assert parser.pending == 0
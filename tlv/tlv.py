@@ -15,7 +15,7 @@
 """
 
 from __future__ import annotations
-from typing import List
+from typing import List, Optional, Tuple
 
 
 class TLV():
@@ -28,14 +28,39 @@ class TLV():
 
     @staticmethod
     def parse_tlvs(data: bytes) -> List[TLV]:
-        res: List[TLV] = []
-        while data:
-            next_tlv = TLV.from_bytes(data)
-            next_tlv_size = len(next_tlv.to_bytes())
-            data = data[next_tlv_size:]
-            res.append(next_tlv)
+        res, consumed = TLV.parse_complete_tlvs(data)
+        if consumed != len(data):
+            raise ValueError(f'Truncated TLV at offset {consumed}')
         return res
 
+    @staticmethod
+    def parse_complete_tlvs(data: bytes) -> Tuple[List[TLV], int]:
+        # returns the complete TLVs found in data and the number of bytes they take
+        res: List[TLV] = []
+        offset = 0
+        while True:
+            header = TLV.parse_header(data, offset)
+            if header is None:
+                break
+            header_len, length = header
+            end = offset + header_len + length
+            if end > len(data):
+                break
+            res.append(TLV(data[offset], bytes(data[offset + header_len:end])))
+            offset = end
+        return res, offset
+
+    @staticmethod
+    def parse_header(data: bytes, offset: int = 0) -> Optional[Tuple[int, int]]:
+        # returns (header length, value length), None if the header is incomplete
+        if len(data) - offset < 2:
+            return None
+        if data[offset + 1] != 0xFF:
+            return 2, data[offset + 1]
+        if len(data) - offset < 4:
+            return None
+        return 4, int.from_bytes(data[offset + 2:offset + 4], byteorder='big')
+
     @staticmethod
     def from_bytes(data: bytes) -> TLV:
         res = TLV()
@@ -43,16 +68,32 @@ class TLV():
         return res
 
     def set_from_bytes(self, data: bytes):
+        header = TLV.parse_header(data)
+        if header is None:
+            raise ValueError('Incomplete TLV header')
+        header_len, length = header
         self.type = data[0]
-        header_len = 2
-        if data[1] == 0xFF:
-            header_len = 4
-        length = int.from_bytes(data[1:header_len], byteorder='big')
-        self.value = data[header_len:header_len + length]
+        self.value = bytes(data[header_len:header_len + length])
 
     def to_bytes(self) -> bytes:
-        has_long_header = len(self.value) >= 255
-        header_len = 4 if has_long_header else 2
-        len_bytes = len(self.value).to_bytes(header_len - 1, byteorder='big')
-        header = bytes([self.type]) + len_bytes
+        if len(self.value) >= 0xFF:
+            header = bytes([self.type, 0xFF]) + len(self.value).to_bytes(2, 'big')
+        else:
+            header = bytes([self.type, len(self.value)])
         return header + self.value
+
+
+class TLVStreamParser:
+    # collects TLVs from data received in arbitrary pieces
+    def __init__(self):
+        self._buffer = bytearray()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[TLV]:
+        self._buffer += data
+        res, consumed = TLV.parse_complete_tlvs(self._buffer)
+        del self._buffer[:consumed]
+        return res
@@ -0,0 +1,188 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+import traceback
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+ASYNCIO_LOGGER = 'asyncio'
+
+
+def coroutine_stack(coro) -> List[str]:
+    # follows the chain of awaited coroutines, innermost last
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return traceback.StackSummary.extract(frames).format()
+
+
+def task_stack(task: asyncio.Task) -> List[str]:
+    if hasattr(task, 'get_coro'):
+        return coroutine_stack(task.get_coro())
+    # before Python 3.8, only the outermost coroutine of the task is known
+    return traceback.StackSummary.extract(
+        (frame, frame.f_lineno) for frame in task.get_stack()).format()
+
+
+class SlowCallback:
+    def __init__(self, description: str, duration: float, stack: List[str]):
+        self.description = description
+        self.duration = duration
+        # where the coroutine run by the callback was suspended afterwards,
+        # the blocking code is right before it
+        self.stack = stack
+
+    def __str__(self):
+        return f'{self.description} blocked the event loop for ' \
+            f'{self.duration * 1000:.0f} ms' + ''.join(['\n'] + self.stack).rstrip()
+
+
+# Takes the warnings asyncio debug mode logs about callbacks running longer than
+# loop.slow_callback_duration, so they are reported once, by the monitor
+class _SlowCallbackFilter(logging.Filter):
+    def __init__(self, monitor: 'LoopLagMonitor', loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.monitor = monitor
+        self.loop = loop
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not str(record.msg).startswith('Executing') or len(record.args) != 2:
+            return True
+        description, duration = record.args
+        # a task step is logged as the task, which is still suspended where it stopped
+        task = next((task for task in asyncio.all_tasks(self.loop)
+                     if repr(task) == description), None)
+        stack = []
+        if task is not None:
+            if hasattr(task, 'get_name'):
+                description = f'task {task.get_name()}'
+            stack = task_stack(task)
+        self.monitor.add_slow_callback(SlowCallback(description, duration, stack))
+        return False
+
+
+# Measures how late the event loop wakes up a task sleeping for a fixed interval.
+# Lag grows when callbacks block the loop, e.g. with CPU heavy work done on it.
+# With slow_callback_duration, the loop runs in debug mode and every callback taking
+# longer is recorded, with the stack of its coroutine.
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05, max_samples: int = 10000,
+                 slow_callback_duration: Optional[float] = None,
+                 on_slow_callback: Callable[[SlowCallback], None] = None,
+                 max_slow_callbacks: int = 100):
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow_callback_duration = slow_callback_duration
+        self.on_slow_callback = on_slow_callback
+        self.slow_callbacks: Deque[SlowCallback] = deque(maxlen=max_slow_callbacks)
+        self.slow_callback_count = 0
+        self._task = None
+        self._filter = None
+        self._saved_debug = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+        if self.slow_callback_duration is not None:
+            loop = asyncio.get_running_loop()
+            self._saved_debug = (loop.get_debug(), loop.slow_callback_duration)
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback_duration
+            self._filter = _SlowCallbackFilter(self, loop)
+            logging.getLogger(ASYNCIO_LOGGER).addFilter(self._filter)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._filter is not None:
+            logging.getLogger(ASYNCIO_LOGGER).removeFilter(self._filter)
+            loop = self._filter.loop
+            loop.set_debug(self._saved_debug[0])
+            loop.slow_callback_duration = self._saved_debug[1]
+            self._filter = None
+
+    def add_slow_callback(self, slow_callback: SlowCallback):
+        self.slow_callback_count += 1
+        self.slow_callbacks.append(slow_callback)
+        if self.on_slow_callback is not None:
+            self.on_slow_callback(slow_callback)
+
+    def slowest(self, count: int) -> List[SlowCallback]:
+        return sorted(self.slow_callbacks, key=lambda s: s.duration, reverse=True)[:count]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.add(max(loop.time() - expected, 0.0))
+
+    def add(self, lag: float):
+        self.samples.append(lag)
+        self.count += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+
+    def percentile(self, fraction: float) -> float:
+        return self.percentiles([fraction])[0]
+
+    def percentiles(self, fractions: List[float]) -> List[float]:
+        if not self.samples:
+            return [0.0] * len(fractions)
+        ordered = sorted(self.samples)
+        return [ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+                for fraction in fractions]
+
+    def metrics(self) -> Dict[str, float]:
+        # lag in seconds
+        p50, p90, p99 = self.percentiles([0.5, 0.9, 0.99])
+        return {
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': p50,
+            'p90': p90,
+            'p99': p99,
+            'max': self.max,
+            'slow_callbacks': self.slow_callback_count,
+        }
+
+    def __str__(self):
+        metrics = self.metrics()
+        res = 'event loop lag: ' + ', '.join(
+            f'{name} {metrics[name] * 1000:.1f} ms'
+            for name in ['mean', 'p50', 'p90', 'p99', 'max'])
+        if self.slow_callback_duration is not None:
+            res += f', {self.slow_callback_count} slow callback(s)'
+        return res
@@ -0,0 +1,55 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import json
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+OUTPUT_FORMATS = ['text', 'ndjson']
+
+
+# Writes one JSON record per line. Records are encoded compactly and collected in
+# a large buffer, so that a high rate of records does not wait on the terminal
+# or pipe for each line.
+class NdjsonWriter:
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._encode = json.JSONEncoder(separators=(',', ':'), default=str).encode
+
+    def write(self, record: dict):
+        self._stream.write(self._encode(record).encode('utf-8') + b'\n')
+
+    def flush(self):
+        self._stream.flush()
+
+
+@contextmanager
+def stdout_records(output_format: str,
+                   buffer_size: int = 64 * 1024) -> Iterator[Optional[NdjsonWriter]]:
+    # with ndjson, stdout carries the records only and messages meant for people
+    # are moved to stderr
+    if output_format != 'ndjson':
+        yield None
+        return
+    sys.stdout.flush()
+    with open(sys.stdout.fileno(), 'wb', buffering=buffer_size, closefd=False) as stream:
+        original_stdout = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            yield NdjsonWriter(stream)
+        finally:
+            sys.stdout = original_stdout
@@ -0,0 +1,184 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+TLS_RECORD_HEADER_LEN = 5
+
+
+class LinkCounters:
+    FIELDS = [
+        'notifications',
+        'bytes_received',
+        'gatt_writes',
+        'bytes_sent',
+        'tls_records_received',
+        'tls_records_sent',
+        'ssl_want_read_retries',
+        'sleep_iterations',
+        'handshake_flights_sent',
+        'handshake_flights_received',
+        'handshake_bytes_sent',
+        'handshake_bytes_received',
+        'peak_receive_buffer',
+    ]
+
+    def __init__(self):
+        for field in LinkCounters.FIELDS:
+            setattr(self, field, 0)
+        self._record_header = b''
+        self._record_remaining = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {field: getattr(self, field) for field in LinkCounters.FIELDS}
+
+    def count_handshake(self, stats):
+        self.handshake_flights_sent += stats.flights_sent
+        self.handshake_flights_received += stats.flights_received
+        self.handshake_bytes_sent += stats.bytes_sent
+        self.handshake_bytes_received += stats.bytes_received
+
+    def count_records_sent(self, data: bytes):
+        # data read from the outgoing BIO always holds complete records
+        offset = 0
+        while offset + TLS_RECORD_HEADER_LEN <= len(data):
+            self.tls_records_sent += 1
+            length = int.from_bytes(data[offset + 3:offset + 5], byteorder='big')
+            offset += TLS_RECORD_HEADER_LEN + length
+
+    def count_records_received(self, data: bytes):
+        # received data is split at arbitrary points, keep track of the current record
+        offset = 0
+        while offset < len(data):
+            if self._record_remaining:
+                consumed = min(self._record_remaining, len(data) - offset)
+                self._record_remaining -= consumed
+                offset += consumed
+                continue
+            missing = TLS_RECORD_HEADER_LEN - len(self._record_header)
+            self._record_header += data[offset:offset + missing]
+            offset += missing
+            if len(self._record_header) == TLS_RECORD_HEADER_LEN:
+                self.tls_records_received += 1
+                self._record_remaining = int.from_bytes(self._record_header[3:5],
+                                                        byteorder='big')
+                self._record_header = b''
+
+
+class Profiler:
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.memory_diffs: Dict[str, List[tracemalloc.StatisticDiff]] = {}
+        self.counters: List[LinkCounters] = []
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        self._active = False
+
+    @contextmanager
+    def profile(self, name: str):
+        # sections do not nest, an inner section is accounted to the outer one
+        if self._active:
+            yield
+            return
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        self._active = True
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = False
+
+    @contextmanager
+    def trace_memory(self, name: str):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            self.memory_diffs[name] = after.compare_to(before, 'lineno')
+
+    def new_counters(self) -> LinkCounters:
+        counters = LinkCounters()
+        self.counters.append(counters)
+        return counters
+
+    def write_report(self, top: int = 30):
+        with open(self.output_path, 'w') as file:
+            file.write('== counters ==\n')
+            file.write(f'sessions: {len(self.counters)}\n')
+            for field in LinkCounters.FIELDS:
+                values = [getattr(counters, field) for counters in self.counters]
+                total = max(values, default=0) if field.startswith('peak_') \
+                    else sum(values)
+                file.write(f'{field}: {total}\n')
+
+            for name in sorted(self.metrics):
+                file.write(f'\n== metrics: {name} ==\n')
+                for key, value in self.metrics[name].items():
+                    file.write(f'{key}: {value}\n')
+
+            for name in sorted(self.profiles):
+                file.write(f'\n== profile: {name} ==\n')
+                stream = io.StringIO()
+                stats = pstats.Stats(self.profiles[name], stream=stream)
+                stats.sort_stats('cumulative').print_stats(top)
+                file.write(stream.getvalue())
+
+            for name in sorted(self.memory_diffs):
+                file.write(f'\n== memory: {name} ==\n')
+                for diff in self.memory_diffs[name][:top]:
+                    file.write(f'{diff}\n')
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable(output_path: str):
+    global _profiler
+    _profiler = Profiler(output_path)
+
+
+def profile(name: str):
+    return _profiler.profile(name) if _profiler else nullcontext()
+
+
+def trace_memory(name: str):
+    return _profiler.trace_memory(name) if _profiler else nullcontext()
+
+
+def add_metrics(name: str, metrics: Dict[str, float]):
+    if _profiler:
+        _profiler.metrics[name] = metrics
+
+
+def new_counters() -> Optional[LinkCounters]:
+    return _profiler.new_counters() if _profiler else None
+
+
+def write_report():
+    if _profiler:
+        _profiler.write_report()
@@ -0,0 +1,72 @@
+"""
+   Copyright (c) 2023 Nordic Semiconductor ASA
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+# Runs an operation under a deadline per attempt and retries failed attempts after an
+# exponential backoff. The backoff is shortened by a random part of up to jitter, so
+# that sessions which failed together do not retry together as well.
+class RetryPolicy:
+    def __init__(self, timeout: Optional[float], attempts: int = 1,
+                 initial_backoff: float = 0.5, max_backoff: float = 10.0,
+                 jitter: float = 0.5,
+                 retry_on: Tuple[Type[BaseException], ...] = (Exception,)):
+        self.timeout = timeout
+        self.attempts = max(attempts, 1)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def with_attempts(self, attempts: int) -> 'RetryPolicy':
+        return RetryPolicy(self.timeout, attempts, self.initial_backoff,
+                           self.max_backoff, self.jitter, self.retry_on)
+
+    def backoff(self, attempt: int) -> float:
+        # delay after the given failed attempt, counted from 1
+        delay = min(self.initial_backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * (1 - self.jitter * random.random())
+
+    async def run(self, operation: Callable[[], Awaitable[T]],
+                  description: str = 'operation',
+                  on_retry: Callable[[], Awaitable[None]] = None) -> T:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if self.timeout is None:
+                    return await operation()
+                return await asyncio.wait_for(operation(), self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                error = TimeoutError(f'{description} timed out after {self.timeout:g} s')
+            except self.retry_on as e:
+                error = e
+            if attempt == self.attempts:
+                raise error
+            delay = self.backoff(attempt)
+            logger.warning('%s failed (%s), retrying in %.1f s',
+                           description, error, delay)
+            await asyncio.sleep(delay)
+            if on_retry is not None:
+                await on_retry()